@@ -0,0 +1,24 @@
+"""Helpers shared by the benchmarks.
+
+Importing it puts the notes folder on sys.path, so my_library can be
+imported whichever folder a benchmark is run from.
+"""
+
+import os
+import sys
+import time
+
+NOTES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if NOTES_DIR not in sys.path:
+    sys.path.insert(0, NOTES_DIR)
+
+
+def best_time(function, runs):
+    """Seconds of the fastest of runs calls of function."""
+    best = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
@@ -0,0 +1,74 @@
+"""Benchmark YAML loading: python SafeLoader, libyaml CSafeLoader, cold and warm cache.
+
+Run it from the notes folder:
+
+    python benchmarks/document_cache.py --rows 20000
+
+It writes a generated payroll style YAML config to a temporary folder and
+prints the best time of a few runs for every way of loading it.
+"""
+
+import argparse
+import os
+import tempfile
+
+import yaml
+
+from _common import best_time
+
+from my_library.cache_operations import load_document
+
+
+def main():
+    parser = argparse.ArgumentParser(description="YAML loading and document cache benchmark")
+    parser.add_argument("--rows", type=int, default=20000, help="Employees in the generated config")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per case, the best one counts")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "payroll.yml")
+        config = {
+            "employees": [
+                {"username": f"user{i}", "identifier": i, "first_name": "Rachel", "last_name": "Booker",
+                 "salary": 50000 + i, "active": i % 2 == 0}
+                for i in range(args.rows)
+            ],
+        }
+        with open(path, "w") as file:
+            yaml.dump(config, file, Dumper=getattr(yaml, "CSafeDumper", yaml.SafeDumper))
+        size_mb = os.path.getsize(path) / 1024 / 1024
+
+        def python_loader():
+            with open(path) as file:
+                yaml.load(file, Loader=yaml.SafeLoader)
+
+        def c_loader():
+            with open(path) as file:
+                yaml.load(file, Loader=yaml.CSafeLoader)
+
+        cache_runs = iter(range(args.runs))
+
+        def cold_cache():
+            load_document(path, cache_dir=os.path.join(folder, f"cold{next(cache_runs)}"))
+
+        def warm_cache():
+            load_document(path, cache_dir=os.path.join(folder, "warm"))
+
+        warm_cache()  # fill the warm cache once
+        cases = [("SafeLoader (python)", python_loader)]
+        if hasattr(yaml, "CSafeLoader"):
+            cases.append(("CSafeLoader (libyaml)", c_loader))
+        else:
+            print("pyyaml was built without libyaml, CSafeLoader is not available")
+        cases += [("load_document, cold cache", cold_cache), ("load_document, warm cache", warm_cache)]
+
+        print(f"{args.rows} rows, {size_mb:.1f} MB of YAML, best of {args.runs} runs")
+        baseline = None
+        for name, function in cases:
+            seconds = best_time(function, args.runs)
+            baseline = baseline or seconds
+            print(f"{name:<28} {seconds * 1000:10.1f} ms {baseline / seconds:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
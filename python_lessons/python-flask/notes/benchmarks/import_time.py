@@ -0,0 +1,70 @@
+"""Cold import benchmark for my_library, in the style of `python -X importtime`.
+
+Run it from the notes folder:
+
+    python benchmarks/import_time.py --budget-ms 10
+
+It imports the package in fresh interpreters, reads the cumulative time that
+`-X importtime` reports for `my_library` and exits with status 1 when the best
+run is over the budget or when a submodule got imported eagerly.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+NOTES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "my_library"
+
+
+def cold_import(package):
+    """Import package in a new interpreter and return the -X importtime rows."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {package}"],
+        cwd=NOTES_DIR,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in completed.stderr.splitlines():
+        # import time:  self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.strip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold import time budget for my_library")
+    parser.add_argument("--budget-ms", type=float, default=10.0, help="Allowed cumulative import time")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to try, the best run counts")
+    args = parser.parse_args()
+
+    best_us = None
+    eager = set()
+    for _ in range(args.runs):
+        rows = cold_import(PACKAGE)
+        for _, cumulative_us, name in rows:
+            if name == PACKAGE:
+                best_us = cumulative_us if best_us is None else min(best_us, cumulative_us)
+            elif name.startswith(PACKAGE + "."):
+                eager.add(name)
+
+    best_ms = best_us / 1000
+    print(f"{PACKAGE}: best cold import {best_ms:.2f} ms over {args.runs} runs (budget {args.budget_ms:.2f} ms)")
+    if eager:
+        print(f"FAIL: submodules imported eagerly: {', '.join(sorted(eager))}")
+        return 1
+    if best_ms > args.budget_ms:
+        print("FAIL: import time budget exceeded")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""Benchmark my_library.json_operations against the stdlib json module.
+
+Run it from the notes folder:
+
+    python benchmarks/json_backend.py --rows 50000
+
+For every payload it times json.dumps(indent=4), compact dumps and loads
+with the stdlib and with the facade, and checks that both give the same
+text. Install orjson to see the fast backend, without it both columns use
+the stdlib.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from _common import best_time
+
+from my_library import json_operations
+
+TUTORIALS = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))),
+                         "tutorials")
+
+
+def payloads(rows):
+    payroll = [
+        {"Username": f"booker{i}", "Identifier": 9012 + i, "First name": "Rachel", "Last name": "Booker",
+         "salary": 75000.5 + i, "city": "Zürich", "active": i % 3 != 0, "manager": None}
+        for i in range(rows)
+    ]
+    config = {
+        f"service_{i}": {"host": f"10.0.{i % 256}.{i // 256}", "port": 8000 + i, "timeout": 2.5,
+                         "tags": ["api", "internal", f"team-{i % 7}"], "retries": {"count": 3, "backoff": 0.25}}
+        for i in range(rows // 10)
+    }
+    with open(os.path.join(TUTORIALS, "data.json")) as file:
+        lesson = json.load(file)
+    return [("payroll rows", payroll), ("nested config", config), ("tutorials/data.json x1000", [lesson] * 1000)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON backend benchmark")
+    parser.add_argument("--rows", type=int, default=50000, help="Rows in the generated payloads")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per case, the best one counts")
+    args = parser.parse_args()
+
+    print(f"backend: {json_operations.BACKEND}, best of {args.runs} runs")
+    print(f"{'payload':<28}{'operation':<22}{'json ms':>10}{'facade ms':>12}{'speedup':>9}")
+    for name, payload in payloads(args.rows):
+        text = json.dumps(payload)
+        cases = [
+            ("dumps(indent=4)", lambda: json.dumps(payload, indent=4),
+             lambda: json_operations.dumps(payload, indent=4)),
+            ("dumps compact", lambda: json.dumps(payload, separators=(",", ":")),
+             lambda: json_operations.dumps(payload, separators=(",", ":"))),
+            ("loads", lambda: json.loads(text), lambda: json_operations.loads(text)),
+        ]
+        for operation, stdlib, facade in cases:
+            if operation != "loads" and stdlib() != facade():
+                print(f"MISMATCH: {name} {operation} differs from json")
+                return 1
+            stdlib_seconds = best_time(stdlib, args.runs)
+            facade_seconds = best_time(facade, args.runs)
+            print(f"{name:<28}{operation:<22}{stdlib_seconds * 1000:>10.1f}{facade_seconds * 1000:>12.1f}"
+                  f"{stdlib_seconds / facade_seconds:>8.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
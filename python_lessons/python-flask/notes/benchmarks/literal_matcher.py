@@ -0,0 +1,52 @@
+"""Benchmark LiteralMatcher against a re alternation of escaped literals.
+
+Run it from the notes folder:
+
+    python benchmarks/literal_matcher.py --words 50000
+
+It generates a text of random words and replaces a growing set of them
+(10 up to --literals) with re.sub and LiteralMatcher.sub, checks both give
+the same text and prints the best time of a few runs.
+"""
+
+import argparse
+import random
+import re
+import sys
+
+from _common import best_time
+
+from my_library.regex_operations import LiteralMatcher
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LiteralMatcher vs re alternation benchmark")
+    parser.add_argument("--words", type=int, default=50_000, help="Words in the generated text")
+    parser.add_argument("--literals", type=int, default=5000, help="Largest literal set")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per case, the best one counts")
+    args = parser.parse_args()
+
+    generator = random.Random(42)
+    vocabulary = sorted({"".join(generator.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(generator.randint(3, 9)))
+                         for _ in range(args.literals * 4)})
+    text = " ".join(generator.choice(vocabulary) for _ in range(args.words))
+    generator.shuffle(vocabulary)
+
+    print(f"{len(text)} characters, best of {args.runs} runs")
+    sizes = [size for size in (10, 100, 1000, 10_000, 100_000) if size < args.literals] + [args.literals]
+    for size in sizes:
+        literals = vocabulary[:size]
+        pattern = re.compile("|".join(map(re.escape, literals)))
+        matcher = LiteralMatcher(literals)
+        if pattern.sub("#", text) != matcher.sub("#", text):
+            print(f"MISMATCH: {size} literals, LiteralMatcher.sub differs from re.sub")
+            return 1
+        re_seconds = best_time(lambda: pattern.sub("#", text), args.runs)
+        matcher_seconds = best_time(lambda: matcher.sub("#", text), args.runs)
+        print(f"{size:>6} literals   re.sub {re_seconds * 1000:9.1f} ms   LiteralMatcher.sub "
+              f"{matcher_seconds * 1000:9.1f} ms {re_seconds / matcher_seconds:6.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""Benchmark scan() queries against filtering csv.DictReader rows by hand.
+
+Run it from the notes folder:
+
+    python benchmarks/query_scan.py --rows 500000
+
+It writes a generated payroll CSV file to a temporary folder, answers a
+filter + select and a filter + group_by question both ways, checks the
+answers match and prints the best time of a few runs.
+"""
+
+import argparse
+import csv
+import os
+import sys
+import tempfile
+
+from _common import best_time
+
+from my_library.query_operations import col, count, scan
+
+CITIES = ["London", "Paris", "Berlin", "Madrid", "Rome"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="scan() query vs csv.DictReader benchmark")
+    parser.add_argument("--rows", type=int, default=500_000, help="Rows in the generated CSV file")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per case, the best one counts")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "payroll.csv")
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["Username", "Identifier", "First name", "Last name", "city", "salary"])
+            for i in range(args.rows):
+                writer.writerow([f"booker{i}", i, "Rachel", "Booker", CITIES[i % len(CITIES)], 30000 + i % 70000])
+
+        def select_by_hand():
+            with open(path, newline="") as file:
+                return [{"Username": row["Username"]} for row in csv.DictReader(file) if int(row["Identifier"]) > 5000
+                        and int(row["salary"]) > 90000]
+
+        def select_query():
+            return scan(path).where(col("Identifier") > 5000, col("salary") > 90000).select("Username").collect()
+
+        def group_by_hand():
+            groups = {}
+            with open(path, newline="") as file:
+                for row in csv.DictReader(file):
+                    if int(row["Identifier"]) > 5000:
+                        totals = groups.setdefault(row["city"], [0, 0])
+                        totals[0] += 1
+                        totals[1] += int(row["salary"])
+            return [{"city": city, "count": n, "salary_sum": total} for city, (n, total) in groups.items()]
+
+        def group_by_query():
+            return (scan(path).where(col("Identifier") > 5000).group_by("city")
+                    .agg(count(), col("salary").sum()).collect())
+
+        print(f"{args.rows} rows, best of {args.runs} runs")
+        for name, by_hand, query in [("filter + select", select_by_hand, select_query),
+                                     ("filter + group_by", group_by_hand, group_by_query)]:
+            if by_hand() != query():
+                print(f"MISMATCH: {name} query answer differs from the DictReader one")
+                return 1
+            hand_seconds = best_time(by_hand, args.runs)
+            query_seconds = best_time(query, args.runs)
+            print(f"{name:<20} DictReader {hand_seconds * 1000:9.1f} ms   scan {query_seconds * 1000:9.1f} ms"
+                  f" {hand_seconds / query_seconds:6.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
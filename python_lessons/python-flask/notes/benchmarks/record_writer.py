@@ -0,0 +1,73 @@
+"""Benchmark RecordWriter against csv.DictWriter.
+
+Run it from the notes folder:
+
+    python benchmarks/record_writer.py --rows 1000000
+
+It writes generated payroll records to a temporary CSV file with both
+writers, once with every record complete and once with records missing
+fields, checks that the files are identical and prints the best time of a
+few runs.
+"""
+
+import argparse
+import csv
+import filecmp
+import os
+import sys
+import tempfile
+
+from _common import best_time
+
+from my_library.conversion_operations import RecordWriter
+
+FIELDS = ["Username", "Identifier", "First name", "Last name", "salary", "city"]
+
+
+def records(rows, sparse):
+    result = []
+    for i in range(rows):
+        record = {"Username": f"booker{i}", "Identifier": 9012 + i, "First name": "Rachel",
+                  "Last name": "Booker", "salary": 50000 + i % 1000, "city": "London"}
+        if sparse and i % 5 == 0:
+            del record["city"]
+        result.append(record)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RecordWriter vs csv.DictWriter benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Records to write")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per case, the best one counts")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        dict_path = os.path.join(folder, "dict_writer.csv")
+        record_path = os.path.join(folder, "record_writer.csv")
+        print(f"{args.rows} records, best of {args.runs} runs")
+        for name, sparse in [("complete records", False), ("every 5th missing a field", True)]:
+            data = records(args.rows, sparse)
+
+            def dict_writer():
+                with open(dict_path, "w", newline="") as file:
+                    writer = csv.DictWriter(file, fieldnames=FIELDS)
+                    writer.writeheader()
+                    writer.writerows(data)
+
+            def record_writer():
+                with open(record_path, "w", newline="") as file, RecordWriter(file, fieldnames=FIELDS) as writer:
+                    writer.writeheader()
+                    writer.writerows(data)
+
+            dict_seconds = best_time(dict_writer, args.runs)
+            record_seconds = best_time(record_writer, args.runs)
+            if not filecmp.cmp(dict_path, record_path, shallow=False):
+                print(f"MISMATCH: {name}, RecordWriter output differs from DictWriter")
+                return 1
+            print(f"{name:<28} DictWriter {dict_seconds * 1000:9.1f} ms   RecordWriter {record_seconds * 1000:9.1f} ms"
+                  f" {dict_seconds / record_seconds:6.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""Benchmark the serial and process parallel scans of cumulative_add against numpy.cumsum.
+
+Run it from the notes folder, on a machine with several cores:
+
+    python benchmarks/reduce_scan.py --values 5000000 --processes 4
+
+It first checks the parallel scan gives the same running totals and
+differences as the serial one for narrow integer types, whose carries must
+not wrap, then times numpy.cumsum, the serial and the parallel scan of a
+numpy array and of the pure Python (strict) path. Use it to pick
+PARALLEL_THRESHOLD for a machine.
+"""
+
+import argparse
+import sys
+
+import numpy
+
+from _common import best_time
+
+from my_library.reduce_operations import cumulative_add, cumulative_subtract
+
+CHECKED_DTYPES = ["int8", "int32", "uint8"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="cumulative_add serial vs process parallel benchmark")
+    parser.add_argument("--values", type=int, default=5_000_000, help="Values in the scanned input")
+    parser.add_argument("--processes", type=int, default=4, help="Workers of the parallel scan")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per case, the best one counts")
+    args = parser.parse_args()
+
+    for dtype in CHECKED_DTYPES:
+        values = numpy.resize(numpy.array([100, 27, 3], dtype=dtype), args.values)
+        for function in (cumulative_add, cumulative_subtract):
+            serial = function(values, processes=1)
+            parallel = function(values, processes=args.processes)
+            if serial.dtype != parallel.dtype or not numpy.array_equal(serial, parallel):
+                print(f"MISMATCH: {function.__name__} of {dtype} differs between 1 and {args.processes} processes")
+                return 1
+
+    values = numpy.arange(args.values, dtype="int64") % 1000
+    python_values = values.tolist()
+    cases = [
+        ("numpy.cumsum", lambda: numpy.cumsum(values)),
+        ("numpy array, serial", lambda: cumulative_add(values, processes=1)),
+        (f"numpy array, {args.processes} processes", lambda: cumulative_add(values, processes=args.processes)),
+        ("strict list, serial", lambda: cumulative_add(python_values, strict=True, processes=1)),
+        (f"strict list, {args.processes} processes",
+         lambda: cumulative_add(python_values, strict=True, processes=args.processes)),
+    ]
+    print(f"{args.values} values, best of {args.runs} runs")
+    baseline = None
+    for name, function in cases:
+        seconds = best_time(function, args.runs)
+        baseline = baseline or seconds
+        print(f"{name:<28} {seconds * 1000:9.1f} ms {seconds / baseline:7.1f}x numpy.cumsum")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""Benchmark search_files and count_matches on all cores against re.finditer on one.
+
+Run it from the notes folder:
+
+    python benchmarks/regex_parallel.py --megabytes 500
+
+It writes a generated access log to a temporary folder and searches it for
+a CPU heavy pattern with re.finditer over the whole file, then with
+search_files and count_matches for 1, 2, 4... up to --workers processes,
+checks every way finds the same matches and prints the best time of a few
+runs. The speedup needs that many cores, os.cpu_count() says how many.
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+
+from _common import best_time
+
+from my_library.regex_operations import count_matches, search_files
+
+# backtracks a lot on every line, so the search is CPU bound, not I/O bound
+PATTERN = rb"user(\d+)\s+\S+\s+/api/v\d+/(?:\w+/)*items/(\d+)\s+5\d\d"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel regex search benchmark")
+    parser.add_argument("--megabytes", type=int, default=500, help="Size of the generated log")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Most worker processes to try")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per case, the best one counts")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "access.log")
+        block = b"".join(b"2024-05-01 12:00:%02d user%d GET /api/v2/shop/cart/items/%d %d\n"
+                         % (i % 60, i, i * 7, 503 if i % 101 == 0 else 200) for i in range(10_000))
+        with open(path, "wb") as file:
+            for _ in range(max(1, args.megabytes * 1024 * 1024 // len(block))):
+                file.write(block)
+        print(f"{os.path.getsize(path) / 1024 / 1024:.0f} MiB log, {os.cpu_count()} cores, best of {args.runs} runs")
+
+        def one_core():
+            with open(path, "rb") as file:
+                data = file.read()
+            return [match.start() for match in re.finditer(PATTERN, data)]
+
+        expected = one_core()
+        one_core_seconds = best_time(one_core, args.runs)
+        print(f"re.finditer, one process   {one_core_seconds * 1000:9.1f} ms   {len(expected)} matches")
+        workers = 1
+        while True:
+            if [hit.start for hit in search_files(PATTERN, path, workers=workers)] != expected:
+                print(f"MISMATCH: search_files with {workers} workers differs from re.finditer")
+                return 1
+            if count_matches(PATTERN, path, workers=workers) != {path: len(expected)}:
+                print(f"MISMATCH: count_matches with {workers} workers differs from re.finditer")
+                return 1
+            search_seconds = best_time(lambda: list(search_files(PATTERN, path, workers=workers)), args.runs)
+            count_seconds = best_time(lambda: count_matches(PATTERN, path, workers=workers), args.runs)
+            print(f"{workers:>3} workers   search_files {search_seconds * 1000:9.1f} ms "
+                  f"{one_core_seconds / search_seconds:5.1f}x   count_matches {count_seconds * 1000:9.1f} ms "
+                  f"{one_core_seconds / count_seconds:5.1f}x")
+            if workers >= args.workers:
+                break
+            workers = min(workers * 2, args.workers)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
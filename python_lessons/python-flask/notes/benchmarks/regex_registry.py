@@ -0,0 +1,60 @@
+"""Benchmark PatternRegistry against re's own pattern cache with many dynamic patterns.
+
+Run it from the notes folder:
+
+    python benchmarks/regex_registry.py --patterns 2000 --lookups 200000
+
+Every lookup searches a log line with one of --patterns distinct patterns,
+a few hot ones most of the time and the long tail otherwise, the way
+patterns built from user input or config show up in a service. re keeps a
+few hundred compiled patterns, so with more distinct ones it compiles over
+and over; the registry keeps them all. Both give the same matches, which is
+checked.
+"""
+
+import argparse
+import random
+import re
+import sys
+
+from _common import best_time
+
+from my_library.regex_operations import PatternRegistry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PatternRegistry vs re cache benchmark")
+    parser.add_argument("--patterns", type=int, default=2000, help="Distinct patterns")
+    parser.add_argument("--lookups", type=int, default=200_000, help="Searches per run")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per case, the best one counts")
+    args = parser.parse_args()
+
+    patterns = [rf"user(?P<id>{i})\s+(?:GET|POST)\s+/api/v\d+/items/(\d+)" for i in range(args.patterns)]
+    hot = patterns[:20]
+    generator = random.Random(42)
+    workload = [generator.choice(hot) if generator.random() < 0.5 else generator.choice(patterns)
+                for _ in range(args.lookups)]
+    line = "2024-05-01 12:00:00 user7 GET /api/v2/items/12345 200"
+    registry = PatternRegistry(maxsize=args.patterns, warm=hot)
+
+    def with_re():
+        return [re.search(pattern, line) is not None for pattern in workload]
+
+    def with_registry():
+        return [registry.search(pattern, line) is not None for pattern in workload]
+
+    if with_re() != with_registry():
+        print("MISMATCH: registry matches differ from re")
+        return 1
+    registry.clear()
+    re_seconds = best_time(with_re, args.runs)
+    registry_seconds = best_time(with_registry, args.runs)
+    print(f"{args.patterns} patterns, {args.lookups} searches, best of {args.runs} runs")
+    print(f"re.search         {re_seconds * 1000:9.1f} ms")
+    print(f"registry.search   {registry_seconds * 1000:9.1f} ms {re_seconds / registry_seconds:6.1f}x")
+    print(registry.stats())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""Benchmark scan_file against re.finditer on the whole file read into memory.
+
+Run it from the notes folder:
+
+    python benchmarks/regex_scan.py --megabytes 200
+
+It writes a generated access log to a temporary folder, counts the matches
+of a few patterns both ways, checks the counts and offsets agree and prints
+the best time of a few runs and the peak memory of each way.
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import tracemalloc
+
+from _common import best_time
+
+from my_library.regex_operations import scan_file
+
+PATTERNS = [
+    rb"\d{3}-\d{2}-\d{4}",
+    rb"(?P<method>GET|POST) /api/v\d+/items/(\d+)",
+    rb"(?i)error: [^\n]*timeout",
+]
+
+
+def peak_memory(function):
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="scan_file vs re.finditer on the whole file benchmark")
+    parser.add_argument("--megabytes", type=int, default=200, help="Size of the generated log")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per case, the best one counts")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "access.log")
+        block = b"".join(
+            b"2024-05-01 12:00:%02d user%d GET /api/v2/items/%d 200 %s\n"
+            % (i % 60, i, i * 7, b"ssn 123-45-6789" if i % 97 == 0 else b"ERROR: upstream Timeout" if i % 89 == 0
+               else b"ok")
+            for i in range(10_000))
+        with open(path, "wb") as file:
+            for _ in range(max(1, args.megabytes * 1024 * 1024 // len(block))):
+                file.write(block)
+        print(f"{os.path.getsize(path) / 1024 / 1024:.0f} MiB log, best of {args.runs} runs")
+
+        for pattern in PATTERNS:
+            def whole_file():
+                with open(path, "rb") as file:
+                    data = file.read()
+                return [match.start() for match in re.finditer(pattern, data)]
+
+            def chunked():
+                return [match.start() for match in scan_file(pattern, path)]
+
+            if whole_file() != chunked():
+                print(f"MISMATCH: {pattern!r} scan_file differs from re.finditer")
+                return 1
+            whole_seconds = best_time(whole_file, args.runs)
+            chunked_seconds = best_time(chunked, args.runs)
+            whole_peak = peak_memory(lambda: sum(1 for _ in re.finditer(pattern, open(path, "rb").read())))
+            chunked_peak = peak_memory(lambda: sum(1 for _ in scan_file(pattern, path)))
+            print(f"{pattern.decode()[:40]:<42} read + finditer {whole_seconds * 1000:8.1f} ms "
+                  f"{whole_peak / 1024 / 1024:7.1f} MiB   scan_file {chunked_seconds * 1000:8.1f} ms "
+                  f"{chunked_peak / 1024 / 1024:7.1f} MiB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""Benchmark ingest_csv against inserting a CSV file into SQLite row by row.
+
+Run it from the notes folder:
+
+    python benchmarks/sqlite_ingest.py --rows 500000
+
+The row by row loader is the usual first attempt: default pragmas, the
+index created with the table, one execute call per row and a commit every
+--commit-every rows (try 1, as many web handlers do). Both end with the
+same table, which is checked.
+"""
+
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+import tempfile
+
+from _common import best_time
+
+from my_library.sqlite_operations import ingest_csv
+
+
+def row_by_row(csv_path, db_path, commit_every):
+    connection = sqlite3.connect(db_path)
+    connection.execute('CREATE TABLE payroll ("Username" TEXT, "Identifier" INTEGER, "First name" TEXT, '
+                       '"Last name" TEXT, "salary" REAL)')
+    connection.execute('CREATE INDEX idx_payroll_Identifier ON payroll ("Identifier")')
+    with open(csv_path, newline="") as file:
+        reader = csv.reader(file)
+        next(reader)
+        for count, row in enumerate(reader, 1):
+            connection.execute("INSERT INTO payroll VALUES (?, ?, ?, ?, ?)", [cell.strip() for cell in row])
+            if count % commit_every == 0:
+                connection.commit()
+    connection.commit()
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV to SQLite ingestion benchmark")
+    parser.add_argument("--rows", type=int, default=500_000, help="Rows in the generated CSV file")
+    parser.add_argument("--commit-every", type=int, default=100, help="Rows per commit of the row by row loader")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        csv_path = os.path.join(folder, "payroll.csv")
+        with open(csv_path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["Username", "Identifier", "First name", "Last name", "salary"])
+            for i in range(args.rows):
+                writer.writerow([f"booker{i}", 9012 + i, "Rachel", "Booker", 50000.5 + i % 1000])
+
+        # one run, a second one would find the table already there
+        row_seconds = best_time(lambda: row_by_row(csv_path, os.path.join(folder, "row_by_row.sqlite"),
+                                                   args.commit_every), 1)
+
+        stats = ingest_csv(csv_path, os.path.join(folder, "ingest.sqlite"), indexes=["Identifier"])
+
+        query = 'SELECT count(*), sum("Identifier"), sum(salary), typeof(salary) FROM payroll'
+        answers = [sqlite3.connect(os.path.join(folder, name)).execute(query).fetchone()
+                   for name in ("row_by_row.sqlite", "ingest.sqlite")]
+        if answers[0] != answers[1]:
+            print(f"MISMATCH: {answers[0]} != {answers[1]}")
+            return 1
+        print(f"{args.rows} rows")
+        print(f"row by row, commit every {args.commit_every:<6} {row_seconds * 1000:9.1f} ms "
+              f"{args.rows / row_seconds:10.0f} rows/s")
+        print(f"ingest_csv                      {stats.seconds * 1000:9.1f} ms {stats.rows_per_second:10.0f} rows/s"
+              f" {row_seconds / stats.seconds:6.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
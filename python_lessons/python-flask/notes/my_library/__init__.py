@@ -1,18 +1,131 @@
-from .math_operations import add, subtract
-""" 
- 
-def add(a, b):
-    return a + b
+import importlib
 
-def subtract(a, b):
-    return a - b
+# importing typing costs more than the whole package, type checkers treat
+# a module level TYPE_CHECKING = False as typing.TYPE_CHECKING anyway
+TYPE_CHECKING = False
 
+if TYPE_CHECKING:
+    from .math_operations import add, subtract, add_batch, subtract_batch
+    from .string_operations import capitalize_word, capitalize_words, capitalize_words_parallel
+    from .reduce_operations import reduce_add, cumulative_add, cumulative_subtract
+    from .file_operations import (
+        read_chunks, iter_lines, copy_file, copy_files, build_line_index, LineFile, BatchWriter,
+        open_batch_writer, atomic_write, line_aligned_ranges,
+    )
+    from .async_file_operations import read_text, write_text, gather_files
+    from .compression_operations import open_file, ParallelCompressWriter
+    from .conversion_operations import (
+        csv_to_json, normalize_header, csv_rows, columns_to_rows, json_columns_rows,
+        rows_to_json_columns, rows_to_csv, convert_file, convert_tree, RecordWriter, write_records,
+    )
+    from .json_operations import iter_json, json_keys, dumps, loads
+    from .cache_operations import load_document
+    from .table_operations import (
+        infer_types, cast_column, iter_typed_rows, read_typed_columns, compile_table, ColumnarTable,
+    )
+    from .query_operations import scan, col, lit, count, Query
+    from .sqlite_operations import ingest_csv, IngestStats
+    from .regex_operations import (
+        PatternRegistry, RegistryStats, LiteralMatcher, scan_file, FileMatch, search_files,
+        count_matches, SearchHit,
+    )
 
-"""
-from .string_operations import capitalize_word
-""" 
-def capitalize_word(word):
-    return word.capitalize()
+# submodules are only imported the first time one of their names is used,
+# so short lived workers don't pay for the whole package at startup
+_SUBMODULES = (
+    "math_operations",
+    "string_operations",
+    "reduce_operations",
+    "file_operations",
+    "async_file_operations",
+    "compression_operations",
+    "conversion_operations",
+    "json_operations",
+    "cache_operations",
+    "table_operations",
+    "query_operations",
+    "sqlite_operations",
+    "regex_operations",
+)
 
-"""
+_LAZY_ATTRIBUTES = {
+    "add": "math_operations",
+    "subtract": "math_operations",
+    "add_batch": "math_operations",
+    "subtract_batch": "math_operations",
+    "capitalize_word": "string_operations",
+    "capitalize_words": "string_operations",
+    "capitalize_words_parallel": "string_operations",
+    "reduce_add": "reduce_operations",
+    "cumulative_add": "reduce_operations",
+    "cumulative_subtract": "reduce_operations",
+    "read_chunks": "file_operations",
+    "iter_lines": "file_operations",
+    "copy_file": "file_operations",
+    "copy_files": "file_operations",
+    "build_line_index": "file_operations",
+    "LineFile": "file_operations",
+    "BatchWriter": "file_operations",
+    "open_batch_writer": "file_operations",
+    "atomic_write": "file_operations",
+    "read_text": "async_file_operations",
+    "write_text": "async_file_operations",
+    "gather_files": "async_file_operations",
+    "open_file": "compression_operations",
+    "ParallelCompressWriter": "compression_operations",
+    "csv_to_json": "conversion_operations",
+    "iter_json": "json_operations",
+    "load_document": "cache_operations",
+    "normalize_header": "conversion_operations",
+    "csv_rows": "conversion_operations",
+    "columns_to_rows": "conversion_operations",
+    "json_columns_rows": "conversion_operations",
+    "rows_to_json_columns": "conversion_operations",
+    "rows_to_csv": "conversion_operations",
+    "json_keys": "json_operations",
+    "convert_file": "conversion_operations",
+    "convert_tree": "conversion_operations",
+    "infer_types": "table_operations",
+    "cast_column": "table_operations",
+    "iter_typed_rows": "table_operations",
+    "read_typed_columns": "table_operations",
+    "compile_table": "table_operations",
+    "ColumnarTable": "table_operations",
+    "dumps": "json_operations",
+    "loads": "json_operations",
+    "RecordWriter": "conversion_operations",
+    "write_records": "conversion_operations",
+    "scan": "query_operations",
+    "col": "query_operations",
+    "lit": "query_operations",
+    "count": "query_operations",
+    "Query": "query_operations",
+    "ingest_csv": "sqlite_operations",
+    "IngestStats": "sqlite_operations",
+    "PatternRegistry": "regex_operations",
+    "RegistryStats": "regex_operations",
+    "LiteralMatcher": "regex_operations",
+    "scan_file": "regex_operations",
+    "FileMatch": "regex_operations",
+    "line_aligned_ranges": "file_operations",
+    "search_files": "regex_operations",
+    "count_matches": "regex_operations",
+    "SearchHit": "regex_operations",
+}
 
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value  # cache it so __getattr__ is not hit again
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_SUBMODULES) | set(_LAZY_ATTRIBUTES))
@@ -0,0 +1,101 @@
+"""Command line tools of my_library, run them with `python -m my_library <command>`."""
+
+import argparse
+import os
+import re
+import sys
+
+
+def convert(args):
+    from .conversion_operations import convert_tree
+
+    summary = convert_tree(args.source, args.target, args.to, workers=args.workers,
+                           progress=print, progress_every=args.progress_every)
+    print(summary)
+    for relative, error in sorted(summary.failed.items()):
+        print(f"failed {relative}: {error}", file=sys.stderr)
+    return 1 if summary.failed else 0
+
+
+def ingest(args):
+    from .sqlite_operations import ingest_csv
+
+    stats = ingest_csv(args.source, args.database, table=args.table, indexes=args.index, resume=not args.no_resume,
+                       batch_rows=args.batch_rows, commit_rows=args.commit_rows, progress=print,
+                       progress_every=args.progress_every)
+    print(stats)
+    return 0
+
+
+def grep(args):
+    from .regex_operations import count_matches, scan_file, search_files
+
+    # bytes pattern, so offsets are byte offsets like grep -b and any encoding works
+    pattern = os.fsencode(args.pattern)
+    flags = re.IGNORECASE if args.ignore_case else 0
+    output = sys.stdout.buffer
+    if args.count:
+        counts = count_matches(pattern, args.files, flags, workers=args.workers)
+        for path, count in counts.items():
+            output.write(b"%s:%d\n" % (os.fsencode(path), count))
+        output.flush()
+        return 0 if any(counts.values()) else 1
+    if args.workers == 1:
+        # one process streams every file, matches may span lines up to --overlap bytes
+        hits = ((path, match.start(), match.group()) for path in args.files
+                for match in scan_file(pattern, path, flags, overlap=args.overlap))
+    else:
+        hits = ((hit.path, hit.start, hit.text)
+                for hit in search_files(pattern, args.files, flags, workers=args.workers))
+    found = 0
+    for path, start, text in hits:
+        found += 1
+        output.write(b"%s:%d:%s\n" % (os.fsencode(path), start, text))
+    output.flush()
+    return 0 if found else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m my_library", description="my_library command line tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = commands.add_parser("convert", help="Convert a folder of JSON, YAML and CSV files")
+    convert_parser.add_argument("source", help="Folder to read, searched recursively")
+    convert_parser.add_argument("target", help="Folder to write the converted files to")
+    convert_parser.add_argument("--to", choices=["json", "yaml", "csv"], required=True, help="Format to convert to")
+    convert_parser.add_argument("--workers", type=int, default=None, help="Worker processes, all cores by default")
+    convert_parser.add_argument("--progress-every", type=int, default=1000, help="Print progress every N files")
+    convert_parser.set_defaults(handler=convert)
+
+    ingest_parser = commands.add_parser("ingest", help="Load a CSV file into a SQLite table, resumable")
+    ingest_parser.add_argument("source", help="CSV file to load")
+    ingest_parser.add_argument("database", help="SQLite database file, created when missing")
+    ingest_parser.add_argument("--table", default=None, help="Table name, the CSV file name by default")
+    ingest_parser.add_argument("--index", action="append", default=[], help="Column to index once loaded, repeatable")
+    ingest_parser.add_argument("--batch-rows", type=int, default=50_000, help="Rows per executemany call")
+    ingest_parser.add_argument("--commit-rows", type=int, default=500_000, help="Rows per transaction")
+    ingest_parser.add_argument("--no-resume", action="store_true", help="Load the table from scratch")
+    ingest_parser.add_argument("--progress-every", type=int, default=500_000, help="Print progress every N rows")
+    ingest_parser.set_defaults(handler=ingest)
+
+    grep_parser = commands.add_parser("grep", help="Print the regex matches in big files, read in chunks")
+    grep_parser.add_argument("pattern", help="Python regular expression")
+    grep_parser.add_argument("files", nargs="+", help="Files to search, .gz, .bz2 and .xz work too")
+    grep_parser.add_argument("-i", "--ignore-case", action="store_true", help="Match case insensitively")
+    grep_parser.add_argument("-c", "--count", action="store_true", help="Only print the number of matches per file")
+    grep_parser.add_argument("--workers", type=int, default=None,
+                             help="Worker processes searching line aligned shards, all cores by default")
+    grep_parser.add_argument("--overlap", type=int, default=64 * 1024, help="Longest match in bytes with --workers 1")
+    grep_parser.set_defaults(handler=grep)
+
+    args = parser.parse_args(argv)
+    try:
+        return args.handler(args)
+    except BrokenPipeError:
+        # the reader stopped early (| head), point stdout at devnull so the flush at exit doesn't fail again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+
+import asyncio
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+from .compression_operations import open_file
+from .file_operations import DEFAULT_CHUNK_SIZE, atomic_write, iter_lines as _iter_lines
+
+# blocking file calls run on this many threads at most, whatever asyncio asks for
+MAX_IO_THREADS = 32
+# how many files gather_files keeps open at the same time by default
+DEFAULT_CONCURRENCY = 64
+# lines handed over from the reading thread at a time by iter_lines
+LINES_PER_BATCH = 1024
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=MAX_IO_THREADS, thread_name_prefix="my_library-io")
+    return _executor
+
+
+async def _run(function, *args):
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), function, *args)
+
+
+def _read_text(path, encoding):
+    with open_file(path, "r", encoding=encoding) as file:
+        return file.read()
+
+
+def _write_text(path, text, encoding, atomic):
+    if atomic:
+        with atomic_write(path) as writer:
+            writer.write(text.encode(encoding))
+        return
+    with open_file(path, "w", encoding=encoding) as file:
+        file.write(text)
+
+
+async def read_text(path, encoding="utf-8"):
+    """Read a whole text file without blocking the event loop, compressed files included."""
+    return await _run(_read_text, path, encoding)
+
+
+async def write_text(path, text, encoding="utf-8", atomic=False):
+    """Write a whole text file without blocking the event loop, see atomic_write for atomic."""
+    await _run(_write_text, path, text, encoding, atomic)
+
+
+async def iter_lines(path, encoding="utf-8", chunk_size=DEFAULT_CHUNK_SIZE):
+    """Async version of file_operations.iter_lines.
+
+    Lines are read on the thread pool LINES_PER_BATCH at a time so the event
+    loop is not woken up for every single line.
+    """
+    lines = _iter_lines(path, chunk_size, encoding)
+    try:
+        while True:
+            batch = await _run(list, itertools.islice(lines, LINES_PER_BATCH))
+            if not batch:
+                break
+            for line in batch:
+                yield line
+    finally:
+        await _run(lines.close)
+
+
+async def gather_files(paths, texts=None, limit=DEFAULT_CONCURRENCY, encoding="utf-8", return_exceptions=False):
+    """Read (texts is None) or write (texts given) many files concurrently.
+
+    At most limit files are in progress at the same time. Reading returns
+    the contents in the order of paths. A failed file raises its exception
+    right away, but the other files are not cancelled: asyncio.gather lets
+    them go on reading or writing in the background. With
+    return_exceptions=True every file is waited for and a failed one gives
+    its exception in its place in the result.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def read_one(path):
+        async with semaphore:
+            return await read_text(path, encoding)
+
+    async def write_one(path, text):
+        async with semaphore:
+            return await write_text(path, text, encoding)
+
+    if texts is None:
+        jobs = [read_one(path) for path in paths]
+    else:
+        jobs = [write_one(path, text) for path, text in zip(paths, texts, strict=True)]
+    return await asyncio.gather(*jobs, return_exceptions=return_exceptions)
@@ -0,0 +1,95 @@
+
+import hashlib
+import json
+import os
+import pickle
+
+try:
+    import yaml
+except ImportError:  # pyyaml is only needed for .yml and .yaml documents
+    yaml = None
+
+from .compression_operations import compression_from_suffix, open_file
+from .file_operations import atomic_write
+
+# bump when the layout of a cache entry changes so old entries are ignored
+CACHE_VERSION = 1
+CACHE_DIR_VARIABLE = "MY_LIBRARY_CACHE_DIR"
+
+
+def default_cache_dir():
+    return os.environ.get(CACHE_DIR_VARIABLE) or os.path.join(os.path.expanduser("~"), ".cache", "my_library")
+
+
+def yaml_loader():
+    """libyaml's CSafeLoader when pyyaml was built with it, else the python SafeLoader."""
+    if yaml is None:
+        raise ImportError("loading YAML needs pyyaml, install it with `pip install pyyaml`")
+    return getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def parse_document(path):
+    """Parse a .json, .yml or .yaml file (optionally compressed) without any cache."""
+    name = os.fspath(path)
+    if compression_from_suffix(name) is not None:
+        name = os.path.splitext(name)[0]
+    suffix = os.path.splitext(name)[1].lower()
+    if suffix == ".json":
+        with open_file(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    if suffix in (".yml", ".yaml"):
+        with open_file(path, "r", encoding="utf-8") as file:
+            return yaml.load(file, Loader=yaml_loader())
+    raise ValueError(f"don't know how to parse {path}, expected .json, .yml or .yaml")
+
+
+def content_hash(path):
+    """Hex digest of the file content, blake2b is faster than sha256 and plenty here."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_path(path, cache_dir):
+    key = hashlib.blake2b(os.path.abspath(path).encode("utf-8"), digest_size=16).hexdigest()
+    return os.path.join(cache_dir, key + ".pickle")
+
+
+def load_document(path, cache_dir=None, always_hash=False):
+    """Load a JSON or YAML document, reusing the parsed object from a cache.
+
+    The parsed object is pickled in cache_dir (MY_LIBRARY_CACHE_DIR or
+    ~/.cache/my_library) together with the mtime, size and content hash of
+    the file. Same mtime and size means a hit without reading the file; when
+    they changed, or with always_hash=True, the content hash decides, so a
+    touched but unchanged file is not parsed again.
+    """
+    cache_dir = cache_dir or default_cache_dir()
+    cache_path = _cache_path(path, cache_dir)
+    stat = os.stat(path)
+    digest = None
+    try:
+        with open(cache_path, "rb") as cache_file:
+            version, mtime_ns, size, cached_hash, document = pickle.load(cache_file)
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError, TypeError):
+        version = None
+    if version == CACHE_VERSION:
+        if not always_hash and (mtime_ns, size) == (stat.st_mtime_ns, stat.st_size):
+            return document
+        digest = content_hash(path)
+        if digest == cached_hash:
+            _write_cache(cache_path, stat, digest, document)
+            return document
+
+    document = parse_document(path)
+    _write_cache(cache_path, stat, digest or content_hash(path), document)
+    return document
+
+
+def _write_cache(cache_path, stat, digest, document):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    entry = (CACHE_VERSION, stat.st_mtime_ns, stat.st_size, digest, document)
+    with atomic_write(cache_path, fsync=False) as cache_file:
+        cache_file.write(pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL))
@@ -0,0 +1,166 @@
+
+import bz2
+import collections
+import gzip
+import io
+import lzma
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# 4 MiB blocks compress nearly as well as one stream and keep every core busy
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024
+
+_MAGIC_BYTES = {
+    b"\x1f\x8b": "gzip",
+    b"BZh": "bz2",
+    b"\xfd7zXZ\x00": "xz",
+}
+
+_SUFFIXES = {
+    ".gz": "gzip",
+    ".gzip": "gzip",
+    ".bz2": "bz2",
+    ".xz": "xz",
+}
+
+_OPENERS = {
+    "gzip": gzip.open,
+    "bz2": bz2.open,
+    "xz": lzma.open,
+}
+
+# every format accepts several compressed streams one after the other, so
+# blocks compressed on their own can simply be concatenated
+_COMPRESSORS = {
+    "gzip": lambda data, level: gzip.compress(data, compresslevel=level, mtime=0),
+    "bz2": lambda data, level: bz2.compress(data, compresslevel=level),
+    "xz": lambda data, level: lzma.compress(data, preset=level),
+}
+
+_DEFAULT_LEVELS = {
+    "gzip": 6,
+    "bz2": 9,
+    "xz": 6,
+}
+
+
+def compression_from_suffix(path):
+    """Return "gzip", "bz2", "xz" or None from the file name."""
+    return _SUFFIXES.get(os.path.splitext(os.fspath(path))[1].lower())
+
+
+def detect_compression(path):
+    """Return the compression of an existing file from its magic bytes, or None."""
+    with open(path, "rb") as file:
+        header = file.read(6)
+    for magic, compression in _MAGIC_BYTES.items():
+        if header.startswith(magic):
+            return compression
+    return None
+
+
+def open_file(path, mode="rb", encoding=None, newline=None, compression="auto", parallel=False, workers=None,
+              block_size=DEFAULT_BLOCK_SIZE, level=None):
+    """open() that reads and writes .gz, .bz2 and .xz files transparently.
+
+    With compression="auto" files opened for reading are recognised by their
+    magic bytes and files opened for writing by their suffix. Pass a
+    compression name, or None for a plain file, to override it. parallel=True
+    writes with ParallelCompressWriter, compressing blocks on several threads.
+    """
+    writing = any(flag in mode for flag in "wax")
+    if compression == "auto":
+        if writing or ("r" in mode and not os.path.exists(path)):
+            compression = compression_from_suffix(path)
+        else:
+            compression = detect_compression(path)
+    if compression is None:
+        return open(path, mode, encoding=encoding, newline=newline)
+    if compression not in _OPENERS:
+        raise ValueError(f"unknown compression {compression!r}")
+    if parallel and writing:
+        level = _DEFAULT_LEVELS[compression] if level is None else level
+        raw = ParallelCompressWriter(open(path, mode.replace("t", "").replace("b", "") + "b"), compression,
+                                     workers, block_size, level)
+        if "b" in mode:
+            return raw
+        return io.TextIOWrapper(raw, encoding=encoding, newline=newline)
+    if "b" not in mode and "t" not in mode:
+        mode += "t"
+    if level is not None:
+        if compression == "xz":
+            return lzma.open(path, mode, preset=level, encoding=encoding, newline=newline)
+        return _OPENERS[compression](path, mode, level, encoding=encoding, newline=newline)
+    return _OPENERS[compression](path, mode, encoding=encoding, newline=newline)
+
+
+def wrap_compressed(file, compression, mode="wb", level=None):
+    """Wrap an open binary file in a compressed file object of compression.
+
+    Closing the returned object finishes the compressed stream but leaves
+    file open.
+    """
+    level = _DEFAULT_LEVELS[compression] if level is None else level
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=file, mode=mode, compresslevel=level, mtime=0)
+    if compression == "bz2":
+        return bz2.BZ2File(file, mode, compresslevel=level)
+    if compression == "xz":
+        return lzma.LZMAFile(file, mode, preset=level if "w" in mode or "a" in mode else None)
+    raise ValueError(f"unknown compression {compression!r}")
+
+
+class ParallelCompressWriter(io.BufferedIOBase):
+    """Binary writer that compresses block_size blocks on a thread pool.
+
+    zlib, bz2 and lzma release the GIL while compressing, so the blocks are
+    compressed in parallel and written in order as independent compressed
+    streams (gzip members for .gz). Any reader of the format reads the
+    result as one file.
+    """
+
+    def __init__(self, file, compression="gzip", workers=None, block_size=DEFAULT_BLOCK_SIZE, level=None):
+        self.file = file
+        self.compress = _COMPRESSORS[compression]
+        self.level = _DEFAULT_LEVELS[compression] if level is None else level
+        self.block_size = block_size
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        self.buffer = bytearray()
+        self.pending = collections.deque()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) >= self.block_size:
+            self._submit(bytes(self.buffer[:self.block_size]))
+            del self.buffer[:self.block_size]
+        return len(data)
+
+    def _submit(self, block):
+        self.pending.append(self.pool.submit(self.compress, block, self.level))
+        # bound the compressed blocks waiting in memory
+        while len(self.pending) > 2 * self.workers:
+            self.file.write(self.pending.popleft().result())
+
+    def flush(self):
+        if self.closed or self.file.closed:
+            return
+        if self.buffer:
+            self._submit(bytes(self.buffer))
+            self.buffer.clear()
+        while self.pending:
+            self.file.write(self.pending.popleft().result())
+        self.file.flush()
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self.flush()
+            self.pool.shutdown()
+            self.file.close()
+        finally:
+            super().close()
@@ -0,0 +1,515 @@
+
+import collections
+import csv
+import io
+import itertools
+import json
+import operator
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    import yaml
+except ImportError:  # pyyaml is only needed to convert to or from YAML
+    yaml = None
+
+from .cache_operations import content_hash, parse_document
+from .compression_operations import open_file
+from .file_operations import atomic_write
+from .json_operations import iter_json, json_keys
+
+# rows collected before one write call on the output file
+ROWS_PER_WRITE = 1000
+
+
+class ConversionStats:
+    """Rows converted and how long it took."""
+
+    def __init__(self, rows, seconds):
+        self.rows = rows
+        self.seconds = seconds
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else float("inf")
+
+    def __repr__(self):
+        return f"ConversionStats(rows={self.rows}, seconds={self.seconds:.3f}, rows_per_second={self.rows_per_second:.0f})"
+
+
+def csv_to_json(csv_path, json_path, json_lines=False, indent=4, encoding="utf-8", progress=None,
+                progress_every=100_000):
+    """Convert a CSV file to JSON row by row, in constant memory.
+
+    The output is a JSON array of objects, byte for byte what json.dump of
+    list(csv.DictReader(...)) with indent writes, or JSON Lines (one object
+    per line) with json_lines=True. Compressed inputs and outputs work as in
+    open_file. progress(stats) is called every progress_every rows. Returns
+    a ConversionStats.
+    """
+    started = time.perf_counter()
+    rows = 0
+    with open_file(csv_path, "r", encoding=encoding, newline="") as csv_file, \
+            open_file(json_path, "w", encoding=encoding) as json_file:
+        reader = csv.DictReader(csv_file)
+        encode = json.dumps
+        if json_lines:
+            opening, separator, closing, empty = "", "\n", "\n", ""
+        elif indent is None:
+            opening, separator, closing, empty = "[", ", ", "]", "[]"
+        else:
+            # same layout as json.dump(rows, indent=indent): items one level in
+            padding = " " * indent
+            opening, separator, closing, empty = "[\n", ",\n", "\n]", "[]"
+
+            def encode(row):
+                return padding + json.dumps(row, indent=indent).replace("\n", "\n" + padding)
+
+        batch = []
+        for row in reader:
+            batch.append(separator if rows else opening)
+            batch.append(encode(row))
+            rows += 1
+            if len(batch) >= 2 * ROWS_PER_WRITE:
+                json_file.write("".join(batch))
+                batch.clear()
+            if progress is not None and rows % progress_every == 0:
+                progress(ConversionStats(rows, time.perf_counter() - started))
+        batch.append(closing if rows else empty)
+        json_file.write("".join(batch))
+    return ConversionStats(rows, time.perf_counter() - started)
+
+
+def normalize_header(name, case="lower"):
+    """Trim a column name, squeeze inner spaces and fix its case.
+
+    "First name", " First Name " and "first  name" all become "first name"
+    with case="lower"; case="title" gives "First Name", None keeps the case.
+    """
+    name = " ".join(name.split())
+    if case == "lower":
+        return name.lower()
+    if case == "title":
+        return name.title()
+    return name
+
+
+def csv_rows(csv_path, header_case="lower", comment="#", encoding="utf-8"):
+    """Read a row oriented CSV file as (header, rows) in a single pass.
+
+    rows is an iterator of tuples with every cell trimmed, so padded files
+    like payroll.csv come out clean. Blank rows and rows starting with
+    comment are skipped.
+    """
+    file = open_file(csv_path, "r", encoding=encoding, newline="")
+    reader = csv.reader(file)
+    header = ()
+    for row in reader:
+        if row and not (comment and row[0].lstrip().startswith(comment)):
+            header = tuple(normalize_header(name, header_case) for name in row)
+            break
+
+    def rows():
+        with file:
+            for row in reader:
+                if not row or (comment and row[0].lstrip().startswith(comment)):
+                    continue
+                row = tuple(cell.strip() for cell in row)
+                if any(row):
+                    yield row
+
+    return header, rows()
+
+
+def columns_to_rows(columns, header_case="lower"):
+    """Turn a column oriented dict of lists into (header, rows) lazily.
+
+    rows yields one tuple per row, zipping the columns as it goes; str
+    values are trimmed on the way.
+    """
+    header = tuple(normalize_header(name, header_case) for name in columns)
+    rows = (tuple(value.strip() if isinstance(value, str) else value for value in row)
+            for row in zip(*columns.values()))
+    return header, rows
+
+
+def json_columns_rows(json_path, header_case="lower"):
+    """columns_to_rows for a column oriented JSON file that may not fit in memory.
+
+    Every column is streamed with its own iter_json reader and the readers
+    are zipped, so only one row is decoded at a time.
+    """
+    names = json_keys(json_path)
+    header = tuple(normalize_header(name, header_case) for name in names)
+    columns = [iter_json(json_path, (name,)) for name in names]
+    rows = (tuple(value.strip() if isinstance(value, str) else value for value in row)
+            for row in zip(*columns))
+    return header, rows
+
+
+def rows_to_json_columns(header, rows, json_path, encoding="utf-8"):
+    """Write (header, rows) as a column oriented JSON object in constant memory.
+
+    Each column is spilled to its own temporary file while the rows stream
+    by, then the spill files are joined into {"column": [values], ...}.
+    Returns the number of rows written.
+    """
+    directory = os.path.dirname(os.path.abspath(json_path))
+    spills = [tempfile.TemporaryFile("w+", encoding=encoding, dir=directory) for _ in header]
+    try:
+        count = 0
+        for row in rows:
+            separator = ", " if count else ""
+            for spill, value in zip(spills, row):
+                spill.write(separator + json.dumps(value))
+            count += 1
+        with open_file(json_path, "w", encoding=encoding) as json_file:
+            json_file.write("{")
+            for index, (name, spill) in enumerate(zip(header, spills)):
+                json_file.write(("" if index == 0 else ", ") + json.dumps(name) + ": [")
+                spill.seek(0)
+                shutil.copyfileobj(spill, json_file)
+                json_file.write("]")
+            json_file.write("}")
+        return count
+    finally:
+        for spill in spills:
+            spill.close()
+
+
+def rows_to_csv(header, rows, csv_path, encoding="utf-8"):
+    """Write (header, rows) as a row oriented CSV file, return the rows written."""
+    count = 0
+    with open_file(csv_path, "w", encoding=encoding, newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def _extractor(fieldnames):
+    """Function giving the tuple of values of fieldnames from a dict, KeyError if one is missing."""
+    if len(fieldnames) == 1:
+        key = fieldnames[0]
+        return lambda record: (record[key],)
+    if not fieldnames:
+        return lambda record: ()
+    return operator.itemgetter(*fieldnames)
+
+
+class RecordWriter:
+    """csv.DictWriter for many records: same output, a few times faster.
+
+    The field order is compiled once into an operator.itemgetter, so a
+    record holding every field costs one C call instead of a dict lookup
+    per field, and rows are formatted batch_rows at a time into an
+    in-memory buffer that goes to the file with a single write. With the
+    default dialect a batch needing no quoting skips the csv module too.
+
+    Records missing fields get restval. Fields that are not in fieldnames
+    raise ValueError like DictWriter, or are dropped with
+    extrasaction="ignore". Without fieldnames the header is every key of
+    the first batch in order of appearance, so a field the first record
+    lacks still gets its column without a second pass over the records. A
+    key first seen in a later batch raises ValueError (unless
+    extrasaction="ignore"), and the output is then partial: the header and
+    the earlier batches are written, that batch and the rest are not. Pass
+    fieldnames when later records may bring new keys.
+
+    Every record is copied when it is written, so one dict may be changed
+    and written again, as with DictWriter. Rows are buffered: call flush()
+    at the end or use it as a context manager.
+    """
+
+    def __init__(self, file, fieldnames=None, restval="", extrasaction="raise", batch_rows=ROWS_PER_WRITE,
+                 **fmtparams):
+        if extrasaction not in ("raise", "ignore"):
+            raise ValueError(f"extrasaction must be 'raise' or 'ignore', not {extrasaction!r}")
+        self.file = file
+        self.fieldnames = None if fieldnames is None else list(fieldnames)
+        self.restval = restval
+        self.extrasaction = extrasaction
+        self.batch_rows = batch_rows
+        self.rows = 0
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, **fmtparams)
+        self._default_dialect = not fmtparams
+        self._extract = self._format = None
+        self._inferred = fieldnames is None
+        if fieldnames is not None:
+            self._compile()
+        self._header_pending = False
+        self._pending = []
+
+    def _compile(self):
+        self._extract = _extractor(self.fieldnames)
+        # with the default dialect a row without commas, quotes, newlines or None is just
+        # str() of every value joined by commas, which str.format does without the csv module
+        if self._default_dialect and len(self.fieldnames) > 1:
+            self._format = ("{!s}," * len(self.fieldnames))[:-1] + "\r\n"
+
+    def _plain_text(self, rows):
+        """The rows formatted as csv.writer would, or None when some value needs csv's quoting."""
+        text = "".join(itertools.starmap(self._format.format, rows))
+        if (text.count(",") == len(rows) * (len(self.fieldnames) - 1) and text.count("\n") == len(rows)
+                and text.count("\r") == len(rows) and '"' not in text and "None" not in text):
+            return text
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+    def writeheader(self):
+        if self.fieldnames is None:
+            self._header_pending = True  # written once the first batch shows the keys
+        else:
+            self._writer.writerow(self.fieldnames)
+
+    def writerow(self, record):
+        self._pending.append(dict(record))  # the caller may change and write the same dict again
+        if len(self._pending) >= self.batch_rows:
+            self.flush()
+
+    def writerows(self, records):
+        records = iter(records)
+        while True:
+            self._pending.extend(map(dict, itertools.islice(records, self.batch_rows - len(self._pending))))
+            if len(self._pending) < self.batch_rows:
+                return
+            self.flush()
+
+    def flush(self):
+        """Write the pending records to the file."""
+        records = self._pending
+        if self.fieldnames is None and records:
+            keys = {}
+            collections.deque(map(keys.update, records), maxlen=0)
+            self.fieldnames = list(keys)
+            self._compile()
+        if self._header_pending and self.fieldnames is not None:
+            self._writer.writerow(self.fieldnames)
+            self._header_pending = False
+        if records:
+            try:
+                rows = list(map(self._extract, records))
+            except KeyError:
+                # fill the missing fields in, a dict merge is much cheaper than a lookup per field
+                defaults = dict.fromkeys(self.fieldnames, self.restval)
+                records = [{**defaults, **record} for record in records]
+                rows = list(map(self._extract, records))
+            # a record holding every field and more is longer than the header
+            if self.extrasaction == "raise" and max(map(len, records)) > len(self.fieldnames):
+                extra = next(record.keys() - set(self.fieldnames) for record in records
+                             if len(record) > len(self.fieldnames))
+                self._pending.clear()  # dropped, so the flush on close doesn't raise again
+                if self._inferred:
+                    raise ValueError(f"fields {', '.join(map(repr, extra))} first appear after the header was "
+                                     f"written from the first batch, {self.rows} rows are written; pass fieldnames")
+                raise ValueError("dict contains fields not in fieldnames: " + ", ".join(map(repr, extra)))
+            text = None if self._format is None else self._plain_text(rows)
+            if text is None:
+                self._writer.writerows(rows)
+            else:
+                self._buffer.write(text)
+            self.rows += len(records)
+            self._pending.clear()
+        if self._buffer.tell():
+            self.file.write(self._buffer.getvalue())
+            self._buffer.seek(0)
+            self._buffer.truncate()
+
+
+def write_records(records, csv_path, fieldnames=None, restval="", extrasaction="raise", encoding="utf-8",
+                  **fmtparams):
+    """Write dicts to a CSV file with a header through RecordWriter, return the rows written."""
+    with open_file(csv_path, "w", encoding=encoding, newline="") as csv_file:
+        with RecordWriter(csv_file, fieldnames, restval, extrasaction, **fmtparams) as writer:
+            writer.writeheader()
+            writer.writerows(records)
+    return writer.rows
+
+
+FORMATS = {
+    ".json": "json",
+    ".yml": "yaml",
+    ".yaml": "yaml",
+    ".csv": "csv",
+}
+
+SUFFIX_FOR_FORMAT = {
+    "json": ".json",
+    "yaml": ".yml",
+    "csv": ".csv",
+}
+
+MANIFEST_NAME = ".convert_manifest.json"
+# finished files after which convert_tree saves its manifest, so an interrupted run keeps its progress
+MANIFEST_EVERY = 100
+
+
+def _load(path, source_format):
+    if source_format == "csv":
+        header, rows = csv_rows(path, header_case=None)
+        return [dict(zip(header, row)) for row in rows]
+    return parse_document(path)
+
+
+def _records(data, path):
+    """(header, rows) for a dict of columns, (None, records) for a list of dicts or a single dict."""
+    if isinstance(data, dict) and data and all(isinstance(value, list) for value in data.values()):
+        header, rows = columns_to_rows(data, header_case=None)
+        return list(header), rows
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list) or not all(isinstance(item, dict) for item in data):
+        raise ValueError(f"{path} holds no table, CSV needs a list of objects or an object of columns")
+    return None, data
+
+
+def convert_file(source_path, target_path, target_format):
+    """Convert one JSON, YAML or CSV file to target_format ("json", "yaml" or "csv")."""
+    source_format = FORMATS[os.path.splitext(source_path)[1].lower()]
+    data = _load(source_path, source_format)
+    os.makedirs(os.path.dirname(os.path.abspath(target_path)), exist_ok=True)
+    with atomic_write(target_path, fsync=False) as target:
+        if target_format == "json":
+            target.write(json.dumps(data, indent=4))
+        elif target_format == "yaml":
+            target.write(yaml.dump(data, Dumper=getattr(yaml, "CSafeDumper", yaml.SafeDumper), sort_keys=False))
+        elif target_format == "csv":
+            header, rows = _records(data, source_path)
+            if header is None:
+                # one batch for all records, so the header holds every key of every record
+                with RecordWriter(target, batch_rows=max(len(rows), 1)) as writer:
+                    writer.writeheader()
+                    writer.writerows(rows)
+            else:
+                text = io.StringIO()
+                writer = csv.writer(text)
+                writer.writerow(header)
+                writer.writerows(rows)
+                target.write(text.getvalue())
+        else:
+            raise ValueError(f"unknown target format {target_format!r}")
+
+
+def _convert_job(source_path, target_path, target_format, previous_hash):
+    """Worker side of convert_tree: skip unchanged inputs, convert the others."""
+    try:
+        digest = content_hash(source_path)
+        if digest == previous_hash and os.path.exists(target_path):
+            return "skipped", digest, None
+        convert_file(source_path, target_path, target_format)
+        return "converted", digest, None
+    except Exception as error:
+        return "failed", None, f"{type(error).__name__}: {error}"
+
+
+def _read_manifest(manifest_path, target_format):
+    """{relative path: content hash} of the last run, empty if it converted to another format."""
+    try:
+        with open(manifest_path, encoding="utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+    except (FileNotFoundError, ValueError):
+        return {}
+    if not isinstance(manifest, dict) or manifest.get("target_format") != target_format:
+        return {}
+    return manifest.get("files", {})
+
+
+def _write_manifest(manifest_path, target_format, files):
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with atomic_write(manifest_path, fsync=False) as manifest_file:
+        manifest_file.write(json.dumps({"target_format": target_format, "files": files}, indent=4, sort_keys=True))
+
+
+class TreeSummary:
+    """What convert_tree did, for the progress lines and the final report."""
+
+    def __init__(self, total, total_bytes):
+        self.total = total
+        self.total_bytes = total_bytes
+        self.done_bytes = 0
+        self.converted = 0
+        self.skipped = 0
+        self.failed = {}
+        self.started = time.perf_counter()
+
+    @property
+    def done(self):
+        return self.converted + self.skipped + len(self.failed)
+
+    def __str__(self):
+        seconds = time.perf_counter() - self.started
+        return (f"{self.done}/{self.total} files ({self.done_bytes / 1024 / 1024:.1f} of "
+                f"{self.total_bytes / 1024 / 1024:.1f} MB): {self.converted} converted, "
+                f"{self.skipped} unchanged, {len(self.failed)} failed in {seconds:.1f}s")
+
+
+def convert_tree(source_dir, target_dir, target_format, workers=None, progress=None, progress_every=1000):
+    """Convert every JSON, YAML and CSV file under source_dir on a process pool.
+
+    The converted files keep their relative path under target_dir with the
+    suffix of target_format. Files are handed out largest first so one big
+    file does not end up last on a single worker. A content hash manifest in
+    target_dir lets a rerun skip inputs that did not change; it is saved every
+    MANIFEST_EVERY files and when the run stops, so an interrupted run is
+    resumed rather than redone. progress(summary) is called every
+    progress_every files. Returns a TreeSummary.
+    """
+    target_suffix = SUFFIX_FOR_FORMAT[target_format]
+    manifest_path = os.path.join(os.path.abspath(target_dir), MANIFEST_NAME)
+    manifest = _read_manifest(manifest_path, target_format)
+
+    jobs = []
+    for folder, _, names in os.walk(source_dir):
+        names = [name for name in names if os.path.splitext(name)[1].lower() in FORMATS]
+        stems = collections.Counter(os.path.splitext(name)[0] for name in names)
+        for name in names:
+            stem = os.path.splitext(name)[0]
+            # data.json and data.yml would both become data.csv, keep their suffix then
+            target_name = (stem if stems[stem] == 1 else name) + target_suffix
+            source_path = os.path.join(folder, name)
+            relative = os.path.relpath(source_path, source_dir)
+            target_path = os.path.join(target_dir, os.path.dirname(relative), target_name)
+            jobs.append((os.path.getsize(source_path), relative, source_path, target_path))
+    jobs.sort(reverse=True)
+
+    summary = TreeSummary(len(jobs), sum(job[0] for job in jobs))
+    # files not finished yet keep their old hash, their targets are still the old conversions
+    new_manifest = {relative: manifest[relative] for _, relative, _, _ in jobs if relative in manifest}
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(_convert_job, source_path, target_path, target_format, manifest.get(relative)):
+                    (size, relative)
+                for size, relative, source_path, target_path in jobs
+            }
+            for future in as_completed(futures):
+                size, relative = futures[future]
+                status, digest, error = future.result()
+                summary.done_bytes += size
+                if status == "failed":
+                    summary.failed[relative] = error
+                    new_manifest.pop(relative, None)
+                else:
+                    new_manifest[relative] = digest
+                    if status == "converted":
+                        summary.converted += 1
+                    else:
+                        summary.skipped += 1
+                if summary.done % MANIFEST_EVERY == 0:
+                    _write_manifest(manifest_path, target_format, new_manifest)
+                if progress is not None and summary.done % progress_every == 0:
+                    progress(summary)
+    finally:
+        _write_manifest(manifest_path, target_format, new_manifest)
+    return summary
@@ -0,0 +1,460 @@
+
+import array
+import contextlib
+import hashlib
+import mmap
+import os
+import stat
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .compression_operations import compression_from_suffix, detect_compression, open_file, wrap_compressed
+
+# 1 MiB is large enough to amortize the syscall and small enough to stay in cache
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+
+def _open_binary(source):
+    """Open a path for binary reading, or use an open file as is.
+
+    .gz, .bz2 and .xz files are decompressed on the fly.
+    """
+    if hasattr(source, "readinto"):
+        return contextlib.nullcontext(source)
+    compression = detect_compression(source)
+    if compression is not None:
+        return open_file(source, "rb", compression=compression)
+    # readinto on the raw file skips the extra copy a BufferedReader would make
+    return open(source, "rb", buffering=0)
+
+
+def read_chunks(source, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the content of a file as memoryviews of at most chunk_size bytes.
+
+    source is a path or a binary file. Every chunk is read with readinto into
+    the same bytearray, so a chunk is only valid until the next one is
+    requested; copy it with bytes(chunk) to keep it.
+    """
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with _open_binary(source) as file:
+        while True:
+            size = file.readinto(buffer)
+            if not size:
+                break
+            yield view[:size]
+
+
+def iter_lines(source, chunk_size=DEFAULT_CHUNK_SIZE, encoding=None):
+    """Yield the lines of a file, with their line endings, read in chunks.
+
+    Lines are bytes, or str decoded with encoding when it is given (any ascii
+    compatible encoding such as utf-8). A line split across two chunks is
+    stitched together, so peak memory is one chunk plus the longest line.
+    """
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    pending = bytearray()
+    with _open_binary(source) as file:
+        while True:
+            size = file.readinto(buffer)
+            if not size:
+                break
+            start = 0
+            while True:
+                end = buffer.find(b"\n", start, size) + 1
+                if not end:
+                    break
+                if pending:
+                    pending += view[start:end]
+                    line = bytes(pending)
+                    pending.clear()
+                else:
+                    line = bytes(view[start:end])
+                yield line.decode(encoding) if encoding else line
+                start = end
+            pending += view[start:size]
+    if pending:
+        yield pending.decode(encoding) if encoding else bytes(pending)
+
+
+def line_aligned_ranges(path, chunk_size):
+    """Split the file into (start, end) byte ranges of about chunk_size that end on a newline."""
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, "rb") as file:
+        start = 0
+        while start < size:
+            file.seek(min(start + chunk_size, size))
+            file.readline()
+            end = min(file.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def _copy_file_range(source, target, size, chunk_size):
+    """Copy inside the kernel, on the same filesystem it may even share blocks."""
+    copied = 0
+    while copied < size:
+        sent = os.copy_file_range(source.fileno(), target.fileno(), size - copied)
+        if not sent:
+            # not supported for this file, or it shrank; the next way starts over
+            raise OSError(f"copy_file_range stopped after {copied} of {size} bytes")
+        copied += sent
+    return copied
+
+
+def _sendfile(source, target, size, chunk_size):
+    """Copy inside the kernel, without the data passing through user space."""
+    copied = 0
+    while copied < size:
+        sent = os.sendfile(target.fileno(), source.fileno(), copied, size - copied)
+        if not sent:
+            raise OSError(f"sendfile stopped after {copied} of {size} bytes")
+        copied += sent
+    target.seek(copied)
+    return copied
+
+
+def _mmap_copy(source, target, size, chunk_size):
+    """Write straight out of the page cache mapping, no read buffer needed."""
+    if not size:
+        return 0
+    with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        view = memoryview(mapped)
+        try:
+            for start in range(0, size, chunk_size):
+                target.write(view[start:start + chunk_size])
+        finally:
+            view.release()
+    return size
+
+
+def _readinto_copy(source, target, size, chunk_size):
+    copied = 0
+    for chunk in read_chunks(source, chunk_size):
+        target.write(chunk)
+        copied += len(chunk)
+    return copied
+
+
+_COPY_STRATEGIES = []
+if hasattr(os, "copy_file_range"):
+    _COPY_STRATEGIES.append(_copy_file_range)
+if hasattr(os, "sendfile"):
+    _COPY_STRATEGIES.append(_sendfile)
+_COPY_STRATEGIES += [_mmap_copy, _readinto_copy]
+
+
+def copy_file(source_path, target_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Copy a binary file (an image for example) and return the bytes copied.
+
+    The fastest available way is used: os.copy_file_range, then os.sendfile,
+    then an mmap of the source and finally chunked readinto. Memory use stays
+    at most one chunk whatever the file size. Files whose size isn't known
+    up front (pipes, devices, /proc files that report 0 bytes) are read in
+    chunks until they end.
+    """
+    with open(source_path, "rb", buffering=0) as source, open(target_path, "wb", buffering=0) as target:
+        status = os.fstat(source.fileno())
+        size = status.st_size
+        strategies = _COPY_STRATEGIES
+        if not size or not stat.S_ISREG(status.st_mode):
+            strategies = [_readinto_copy]
+        for strategy in strategies:
+            try:
+                return strategy(source, target, size, chunk_size)
+            except (OSError, ValueError):
+                # not supported for this pair of files, start over with the next way
+                source.seek(0)
+                target.seek(0)
+                target.truncate()
+        raise OSError(f"could not copy {source_path} to {target_path}")
+
+
+def copy_files(pairs, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Copy many (source_path, target_path) pairs in parallel.
+
+    The copies run on a thread pool since the copy syscalls release the GIL.
+    Returns the bytes copied per pair, in the order of pairs.
+    """
+    pairs = list(pairs)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda pair: copy_file(pair[0], pair[1], chunk_size), pairs))
+
+
+def _scan_line_ends(file, start, chunk_size):
+    """Offsets just past every newline from start to the end of the file."""
+    offsets = array.array("Q")
+    file.seek(start)
+    position = start
+    for chunk in read_chunks(file, chunk_size):
+        data = chunk.obj
+        size = len(chunk)
+        end = data.find(b"\n", 0, size)
+        while end >= 0:
+            offsets.append(position + end + 1)
+            end = data.find(b"\n", end + 1, size)
+        position += size
+    return offsets
+
+
+LINE_INDEX_MAGIC = b"MLIDX001"
+# bytes at the start of the file and before the indexed end that identify it
+_IDENTITY_BLOCK = 4096
+
+
+def _index_identity(file, end):
+    """Digest of the first and last block before end, an append leaves it unchanged, a rewrite does not."""
+    file.seek(0)
+    head = file.read(min(end, _IDENTITY_BLOCK))
+    file.seek(max(0, end - _IDENTITY_BLOCK))
+    tail = file.read(end - max(0, end - _IDENTITY_BLOCK))
+    return hashlib.blake2b(head + tail + end.to_bytes(8, "little"), digest_size=16).digest()
+
+
+def _write_index_header(index_file, file, end):
+    index_file.seek(0)
+    index_file.write(LINE_INDEX_MAGIC + _index_identity(file, end))
+
+
+def build_line_index(path, index_path=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Scan a text file once and write the line offsets to a sidecar file.
+
+    The sidecar (path + ".idx" by default) is LINE_INDEX_MAGIC, a digest
+    of the indexed part of the file and a flat array of native uint64: 0
+    followed by the offset just past each newline. Returns the offsets.
+    """
+    index_path = index_path or path + ".idx"
+    offsets = array.array("Q", [0])
+    with open(path, "rb", buffering=0) as file:
+        offsets.extend(_scan_line_ends(file, 0, chunk_size))
+        with open(index_path, "wb") as index_file:
+            _write_index_header(index_file, file, offsets[-1])
+            offsets.tofile(index_file)
+    return offsets
+
+
+class LineFile:
+    """Random access to the lines of a text file through a line offset index.
+
+    lines[n] and lines[start:stop] seek straight to the wanted lines instead
+    of reading the file from the top. When the file has been appended to,
+    refresh() (called on open) only indexes the new part; an index that no
+    longer matches the start or the indexed end of the file is rebuilt.
+    """
+
+    def __init__(self, path, encoding="utf-8", index_path=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.path = path
+        self.encoding = encoding
+        self.index_path = index_path or path + ".idx"
+        self.chunk_size = chunk_size
+        self.offsets = array.array("Q")
+        self.size = 0
+        self.file = open(path, "rb")
+        try:
+            self._load_index()
+            self.refresh()
+        except BaseException:
+            self.file.close()
+            raise
+
+    def _load_index(self):
+        """Offsets from the sidecar, only when it still describes this file."""
+        header_size = len(LINE_INDEX_MAGIC) + 16
+        try:
+            with open(self.index_path, "rb") as index_file:
+                header = index_file.read(header_size)
+                offsets = array.array("Q", index_file.read())
+        except (OSError, ValueError):
+            return
+        if not offsets or header[:len(LINE_INDEX_MAGIC)] != LINE_INDEX_MAGIC:
+            return
+        end = offsets[-1]
+        if end > os.fstat(self.file.fileno()).st_size:
+            return
+        if header[len(LINE_INDEX_MAGIC):] == _index_identity(self.file, end):
+            self.offsets = offsets
+
+    def refresh(self):
+        """Index lines appended since the last refresh, rebuild if the file shrank."""
+        self.size = os.fstat(self.file.fileno()).st_size
+        if not self.offsets or self.offsets[-1] > self.size:
+            self.offsets = build_line_index(self.path, self.index_path, self.chunk_size)
+            return
+        if self.offsets[-1] == self.size:
+            return
+        new_offsets = _scan_line_ends(self.file, self.offsets[-1], self.chunk_size)
+        if new_offsets:
+            self.offsets.extend(new_offsets)
+            with open(self.index_path, "r+b") as index_file:
+                index_file.seek(0, os.SEEK_END)
+                new_offsets.tofile(index_file)
+                _write_index_header(index_file, self.file, self.offsets[-1])
+
+    def __len__(self):
+        # a last line without a newline is not in the index until it is finished
+        return len(self.offsets) - 1 + (self.size > self.offsets[-1])
+
+    def _line_start(self, number):
+        return self.offsets[number] if number < len(self.offsets) else self.size
+
+    def lines(self, start, stop):
+        """Return lines start to stop (exclusive) with a single seek and read."""
+        start = max(0, min(start, len(self)))
+        stop = max(start, min(stop, len(self)))
+        if start == stop:
+            return []
+        starts = [self._line_start(number) - self._line_start(start) for number in range(start, stop + 1)]
+        self.file.seek(self._line_start(start))
+        data = self.file.read(starts[-1])
+        return [data[begin:end].decode(self.encoding) for begin, end in zip(starts, starts[1:])]
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if step != 1:
+                return [self[number] for number in range(start, stop, step)]
+            return self.lines(start, stop)
+        number = item + len(self) if item < 0 else item
+        if not 0 <= number < len(self):
+            raise IndexError("line number out of range")
+        return self.lines(number, number + 1)[0]
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+FSYNC_NEVER = "never"
+FSYNC_BATCH = "batch"
+FSYNC_INTERVAL = "interval"
+
+
+class BatchWriter:
+    """Collect many small writes and flush them to the file in large batches.
+
+    fsync decides when flushed data is forced to disk: FSYNC_NEVER leaves it
+    to the OS, FSYNC_BATCH syncs after every flush and FSYNC_INTERVAL syncs
+    at most once every fsync_interval seconds. str records are encoded with
+    encoding, bytes-like records are written as they are.
+    """
+
+    def __init__(self, file, batch_size=DEFAULT_CHUNK_SIZE, fsync=FSYNC_NEVER, fsync_interval=1.0,
+                 encoding="utf-8"):
+        if fsync not in (FSYNC_NEVER, FSYNC_BATCH, FSYNC_INTERVAL):
+            raise ValueError(f"unknown fsync policy {fsync!r}")
+        self.file = file
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.encoding = encoding
+        self.buffer = bytearray()
+        self.last_sync = time.monotonic()
+
+    def write(self, record):
+        if isinstance(record, str):
+            record = record.encode(self.encoding)
+        self.buffer += record
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def writelines(self, records):
+        for record in records:
+            self.write(record)
+
+    def _write_buffer(self):
+        if self.buffer:
+            written = 0
+            with memoryview(self.buffer) as view:
+                # a raw file may write less than asked, the rest goes in the next call
+                while written < len(view):
+                    count = self.file.write(view[written:])
+                    written += len(view) - written if count is None else count
+            self.buffer.clear()
+        self.file.flush()
+
+    def flush(self):
+        """Write the collected records in as few write calls as the file allows and apply the fsync policy."""
+        self._write_buffer()
+        if self.fsync == FSYNC_BATCH:
+            self.sync()
+        elif self.fsync == FSYNC_INTERVAL and time.monotonic() - self.last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        os.fsync(self.file.fileno())
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        self._write_buffer()
+        if self.fsync != FSYNC_NEVER:
+            self.sync()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def open_batch_writer(path, mode="wb", **options):
+    """Open path for writing ("wb" or "ab") wrapped in a BatchWriter.
+
+    A .gz, .bz2 or .xz suffix compresses the output.
+    """
+    if compression_from_suffix(path) is not None:
+        return BatchWriter(open_file(path, mode), **options)
+    return BatchWriter(open(path, mode, buffering=0), **options)
+
+
+@contextlib.contextmanager
+def atomic_write(path, fsync=True, **options):
+    """Write a whole file so readers see either the old or the new content.
+
+    Everything goes through a BatchWriter into a temporary file in the same
+    directory, which replaces path with os.replace once the block succeeds.
+    When the block raises, the temporary file is removed and path is left
+    untouched. A .gz, .bz2 or .xz suffix compresses the output.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    raw = os.fdopen(descriptor, "wb", buffering=0)
+    compression = compression_from_suffix(path)
+    stream = wrap_compressed(raw, compression) if compression else raw
+    writer = BatchWriter(stream, **options)
+    try:
+        yield writer
+        writer.flush()
+        if stream is not raw:
+            stream.close()  # writes the end of the compressed stream
+        if fsync:
+            os.fsync(raw.fileno())
+        raw.close()
+        try:
+            mode = os.stat(path).st_mode & 0o777
+        except FileNotFoundError:
+            mode = 0o644
+        os.chmod(temp_path, mode)  # mkstemp creates the file readable by the owner only
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError, ValueError):
+            stream.close()
+        raw.close()
+        os.remove(temp_path)
+        raise
+    if fsync and hasattr(os, "O_DIRECTORY"):
+        # make the rename itself survive a crash
+        directory_descriptor = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(directory_descriptor)
+        finally:
+            os.close(directory_descriptor)
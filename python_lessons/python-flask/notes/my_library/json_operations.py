@@ -0,0 +1,360 @@
+
+import codecs
+import json
+import os
+import re
+from math import isfinite
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the stdlib json module is used without it
+    orjson = None
+
+from .compression_operations import open_file
+
+# characters read from the file at a time by iter_json
+DEFAULT_READ_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_STRUCTURE = re.compile(r'["\[\]{}]')
+_STRING_END = re.compile(r'["\\]')
+_DELIMITERS = frozenset(" \t\n\r,:]}")
+_decoder = json.JSONDecoder()
+
+
+class _JsonStream:
+    """A sliding window over a JSON text that is read in pieces."""
+
+    def __init__(self, file, read_size):
+        self.file = file
+        self.read_size = read_size
+        self.decoder = None
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+
+    def fill(self, size=None):
+        """Drop what was consumed and append the next piece of the file."""
+        data = self.file.read(size or self.read_size)
+        if isinstance(data, bytes):
+            if self.decoder is None:
+                self.decoder = codecs.getincrementaldecoder("utf-8")()
+            raw = data
+            data = self.decoder.decode(raw, final=not raw)
+            while raw and not data:
+                # only part of a multi byte character was read
+                raw = self.file.read(size or self.read_size)
+                data = self.decoder.decode(raw, final=not raw)
+        if not data:
+            self.eof = True
+        self.buffer = self.buffer[self.position:] + data
+        self.position = 0
+        return bool(data)
+
+    def peek(self):
+        """Return the next character that is not whitespace, "" at the end."""
+        while True:
+            self.position = _WHITESPACE.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill():
+                return ""
+
+    def expect(self, character):
+        found = self.peek()
+        if found != character:
+            raise ValueError(f"expected {character!r} but found {found or 'end of file'!r}")
+        self.position += 1
+
+    def decode(self):
+        """Decode the next complete value, reading more until it is complete."""
+        self.peek()
+        size = self.read_size
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.position)
+                # a number cut at the end of the buffer ("12" of "12.5") looks
+                # complete, only a delimiter after it proves it is
+                if self.eof or (end < len(self.buffer) and self.buffer[end] in _DELIMITERS):
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # read larger pieces for large values so decoding is not retried too often
+            self.fill(size)
+            size *= 2
+
+    def skip(self):
+        """Skip the next value without decoding it, in constant memory."""
+        if self.peek() not in ("[", "{", '"'):
+            self.decode()
+            return
+        depth = 0
+        while True:
+            match = _STRUCTURE.search(self.buffer, self.position)
+            if match is None:
+                self.position = len(self.buffer)
+                if not self.fill():
+                    raise ValueError("unexpected end of file")
+                continue
+            self.position = match.end()
+            character = match.group()
+            if character == '"':
+                self._skip_string()
+            elif character in "[{":
+                depth += 1
+            else:
+                depth -= 1
+            if depth == 0:
+                return
+
+    def _skip_string(self):
+        while True:
+            match = _STRING_END.search(self.buffer, self.position)
+            if match is None or (match.group() == "\\" and match.end() == len(self.buffer)):
+                self.position = len(self.buffer) if match is None else match.start()
+                if not self.fill():
+                    raise ValueError("unterminated string")
+                continue
+            if match.group() == '"':
+                self.position = match.end()
+                return
+            self.position = match.end() + 1  # jump over the escaped character
+
+
+def _descend(stream, keys):
+    """Move the stream to the value found by following keys through objects."""
+    for key in keys:
+        stream.expect("{")
+        while True:
+            if stream.peek() == "}":
+                raise KeyError(key)
+            name = stream.decode()
+            stream.expect(":")
+            if name == key:
+                break
+            stream.skip()
+            if stream.peek() == ",":
+                stream.position += 1
+
+
+def iter_json(file_or_path, path=(), read_size=DEFAULT_READ_SIZE):
+    """Yield the items of a JSON array one at a time while the file is read.
+
+    path selects a nested value by object keys, as a tuple or a dotted string
+    ("employees" picks data["employees"]). When the selected value is an
+    object its (key, value) pairs are yielded instead. Only the current item
+    and one piece of the file are kept in memory; values before the selected
+    one are skipped without decoding.
+    """
+    if isinstance(path, str):
+        path = tuple(path.split(".")) if path else ()
+    if hasattr(file_or_path, "read"):
+        yield from _iter_items(_JsonStream(file_or_path, read_size), path)
+        return
+    with open_file(file_or_path, "rb") as file:
+        yield from _iter_items(_JsonStream(file, read_size), path)
+
+
+def _iter_items(stream, path):
+    _descend(stream, path)
+    opening = stream.peek()
+    if not opening or opening not in "[{":
+        raise ValueError(f"expected an array or object at {'.'.join(path) or 'the top level'}")
+    closing = "]" if opening == "[" else "}"
+    stream.position += 1
+    if stream.peek() == closing:
+        return
+    while True:
+        if opening == "[":
+            yield stream.decode()
+        else:
+            key = stream.decode()
+            stream.expect(":")
+            yield key, stream.decode()
+        separator = stream.peek()
+        stream.position += 1
+        if separator == closing:
+            return
+        if separator != ",":
+            raise ValueError(f"expected ',' or {closing!r} but found {separator or 'end of file'!r}")
+
+
+def json_keys(file_or_path, path=(), read_size=DEFAULT_READ_SIZE):
+    """Return the keys of the object at path, skipping its values undecoded."""
+    if isinstance(path, str):
+        path = tuple(path.split(".")) if path else ()
+    if hasattr(file_or_path, "read"):
+        return _keys(_JsonStream(file_or_path, read_size), path)
+    with open_file(file_or_path, "rb") as file:
+        return _keys(_JsonStream(file, read_size), path)
+
+
+def _keys(stream, path):
+    _descend(stream, path)
+    stream.expect("{")
+    keys = []
+    while stream.peek() not in ("}", ""):
+        keys.append(stream.decode())
+        stream.expect(":")
+        stream.skip()
+        if stream.peek() == ",":
+            stream.position += 1
+    stream.expect("}")
+    return keys
+
+
+# set MY_LIBRARY_JSON_BACKEND=json to force the stdlib module, e.g. to compare outputs
+BACKEND = "orjson" if orjson is not None and os.environ.get("MY_LIBRARY_JSON_BACKEND") != "json" else "json"
+
+# json escapes DEL too when ensure_ascii is on
+_NON_ASCII = re.compile(r"[^\x00-\x7e]")
+# strings are matched first so nothing inside them is ever rewritten
+_FLOAT_NUMBER = re.compile(r'("(?:[^"\\]|\\.)*")|(-?\d+(?:\.\d+)?[eE][-+]?\d+|-?\d+\.\d+)')
+# orjson only indents by 2, the indentation of every level is first written with this byte
+# and turned into spaces at the end; JSON escapes control characters so it can't clash
+_INDENT_MARK = b"\x01"
+_MARK_TO_SPACE = bytes.maketrans(_INDENT_MARK, b" ")
+_ASTRAL_LEADS = (b"\xf0", b"\xf1", b"\xf2", b"\xf3", b"\xf4")
+# types that can't hold a float, skipped quickly by _float_check
+_SCALARS = frozenset((str, int, bool, type(None)))
+# maps digits to b"0", b"-" to itself and everything else to b" "; orjson reads ints up to
+# 2**64 - 1 and down to -2**63 exactly and turns bigger ones into floats, so 20 digits, or 19
+# after a minus, may not fit and go to json
+_DIGITS_ONLY = bytes(48 if 48 <= byte <= 57 else 45 if byte == 45 else 32 for byte in range(256))
+_LONG_INT = b"0" * 20
+_LONG_NEGATIVE_INT = b"-" + b"0" * 19
+
+
+def use_backend(name):
+    """Switch the backend of dumps/loads to "orjson" or "json"."""
+    global BACKEND
+    if name == "orjson" and orjson is None:
+        raise ImportError("the orjson backend needs orjson, install it with `pip install orjson`")
+    if name not in ("orjson", "json"):
+        raise ValueError(f"unknown JSON backend {name!r}")
+    BACKEND = name
+
+
+def _float_check(obj):
+    """None when obj holds NaN or Infinity (orjson writes null for them), else
+    whether some float may be formatted differently from float.__repr__."""
+    stack = [(obj,)]
+    reformat = False
+    while stack:
+        container = stack.pop()
+        for value in container.values() if isinstance(container, dict) else container:
+            if type(value) in _SCALARS:
+                continue
+            if isinstance(value, float):
+                if not isfinite(value):
+                    return None
+                # orjson writes 1e16 and 0.00001 where repr writes 1e+16 and 1e-05
+                if value and not 1e-4 <= abs(value) < 1e16:
+                    reformat = True
+            elif isinstance(value, (dict, list, tuple)):
+                stack.append(value)
+    return reformat
+
+
+def _escape_non_ascii(match):
+    code = ord(match.group())
+    if code > 0xFFFF:
+        code -= 0x10000
+        return "\\u{:04x}\\u{:04x}".format(0xD800 | (code >> 10), 0xDC00 | (code & 0x3FF))
+    return "\\u{:04x}".format(code)
+
+
+def _ascii_only(data):
+    if b"\x7f" in data:
+        data = data.replace(b"\x7f", b"\\u007f")
+    if data.isascii():
+        return data.decode("ascii")
+    text = data.decode("utf-8")
+    # backslashreplace writes \xe9, patched to \u00e9 below unless the text already held a \x;
+    # characters beyond the BMP (UTF-8 lead bytes 0xf0-0xf4) need surrogate pairs
+    if b"\\" in data and b"\\x" in data or any(lead in data for lead in _ASTRAL_LEADS):
+        return _NON_ASCII.sub(_escape_non_ascii, text)
+    return text.encode("ascii", "backslashreplace").replace(b"\\x", b"\\u00").decode("ascii")
+
+
+def _reindent(data, indent):
+    depth = 1
+    while b"\n" + b"  " * (depth + 1) in data:
+        depth += 1
+    # deepest first, a marked line no longer starts with spaces so it isn't matched again
+    for level in range(depth, 0, -1):
+        data = data.replace(b"\n" + b"  " * level, b"\n" + _INDENT_MARK * (level * indent))
+    return data.translate(_MARK_TO_SPACE)
+
+
+def _python_float(match):
+    return match.group(1) or repr(float(match.group(2)))
+
+
+def _orjson_dumps(obj, indent, sort_keys, ensure_ascii):
+    reformat = _float_check(obj)
+    if reformat is None:
+        return None
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    if sort_keys:
+        options |= orjson.OPT_SORT_KEYS
+    if indent is not None:
+        options |= orjson.OPT_INDENT_2
+    data = orjson.dumps(obj, option=options)
+    if indent is not None and indent != 2:
+        data = _reindent(data, indent)
+    text = _ascii_only(data) if ensure_ascii else data.decode("utf-8")
+    if reformat:
+        text = _FLOAT_NUMBER.sub(_python_float, text)
+    return text
+
+
+def dumps(obj, indent=None, sort_keys=False, ensure_ascii=True, separators=None, **kwargs):
+    """json.dumps with a faster backend where it gives the exact same text.
+
+    orjson is used for integer indents (indent=4 included) and for compact
+    separators=(",", ":"), the cases where the stdlib is slowest; its output
+    is patched to match json.dumps byte for byte. Anything orjson does not
+    handle the same way (big ints, non str keys, default=, NaN, ...) goes
+    to the stdlib.
+    """
+    compact = separators == (",", ":")
+    if (BACKEND == "orjson" and not kwargs and (compact and indent is None
+                                                or isinstance(indent, int) and separators is None)):
+        try:
+            text = _orjson_dumps(obj, indent, sort_keys, ensure_ascii)
+            if text is not None:
+                return text
+        except (orjson.JSONEncodeError, TypeError):
+            pass
+    return json.dumps(obj, indent=indent, sort_keys=sort_keys, ensure_ascii=ensure_ascii,
+                      separators=separators, **kwargs)
+
+
+def loads(text, **kwargs):
+    """json.loads, parsed by orjson when it can give the same result."""
+    if BACKEND == "orjson" and not kwargs:
+        data = text.encode("utf-8", "surrogatepass") if isinstance(text, str) else bytes(text)
+        digits = data.translate(_DIGITS_ONLY)
+        if _LONG_INT not in digits and _LONG_NEGATIVE_INT not in digits:
+            try:
+                return orjson.loads(text)
+            except orjson.JSONDecodeError:
+                pass  # NaN, Infinity, lone surrogates, ... let json decide
+    return json.loads(text, **kwargs)
+
+
+def dump(obj, file, **kwargs):
+    """json.dump through dumps, file may be opened in text or binary mode."""
+    text = dumps(obj, **kwargs)
+    try:
+        file.write(text)
+    except TypeError:  # a binary file, write() refused str before writing anything
+        file.write(text.encode("utf-8"))
+
+
+def load(file, **kwargs):
+    """json.load through loads."""
+    return loads(file.read(), **kwargs)
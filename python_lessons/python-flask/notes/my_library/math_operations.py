@@ -1,6 +1,93 @@
- 
+
+import functools
+import numbers
+import operator
+
+
 def add(a, b):
     return a + b
 
 def subtract(a, b):
     return a - b
+
+
+@functools.cache
+def _numpy():
+    """numpy, or None when it is not installed.
+
+    Imported by the first batch call rather than with the module, numpy
+    takes longer to import than add and subtract ever need.
+    """
+    try:
+        import numpy
+    except ImportError:  # numpy is optional, the batch functions fall back to pure python
+        return None
+    return numpy
+
+
+def _is_scalar(value):
+    return isinstance(value, numbers.Number)
+
+
+def _write_out(result, out):
+    """Copy result into the caller supplied out buffer and return the buffer."""
+    if len(out) != len(result):
+        raise ValueError(f"out has length {len(out)}, expected {len(result)}")
+    for index, value in enumerate(result):
+        out[index] = value
+    return out
+
+
+def _numpy_elementwise(numpy, numpy_op, a, b, out):
+    """Run numpy_op over a and b, writing into out when it is given."""
+    # scalars go to the ufunc as they are, so a Python int or float takes the
+    # array's dtype (numpy's weak scalars) instead of becoming an int64 array
+    left = a if _is_scalar(a) else numpy.asarray(a)
+    right = b if _is_scalar(b) else numpy.asarray(b)
+    if out is None:
+        return numpy_op(left, right)
+    if isinstance(out, list):
+        return _write_out(numpy.atleast_1d(numpy_op(left, right)).tolist(), out)
+    # ndarray, array.array, bytearray and memoryview are viewed in place, not copied
+    numpy_op(left, right, out=numpy.asarray(out))
+    return out
+
+
+def _python_elementwise(op, a, b, out):
+    """Pure python fallback of _numpy_elementwise with scalar broadcasting."""
+    if _is_scalar(a) and _is_scalar(b):
+        if out is None:
+            return op(a, b)  # a scalar, as numpy gives for two scalars
+        result = [op(a, b)]
+    elif _is_scalar(a):
+        result = [op(a, value) for value in b]
+    elif _is_scalar(b):
+        result = [op(value, b) for value in a]
+    else:
+        if len(a) != len(b):
+            raise ValueError(f"operands have different lengths: {len(a)} and {len(b)}")
+        result = list(map(op, a, b))
+    if out is None:
+        return result
+    return _write_out(result, out)
+
+
+def add_batch(a, b, out=None):
+    """Element-wise add for lists, array.array, memoryview or numpy arrays.
+
+    Either operand may be a scalar, which is broadcast over the other one.
+    The result is written into out when given, otherwise a new numpy array
+    (or a list when numpy is not installed) is returned.
+    """
+    numpy = _numpy()
+    if numpy is not None:
+        return _numpy_elementwise(numpy, numpy.add, a, b, out)
+    return _python_elementwise(operator.add, a, b, out)
+
+
+def subtract_batch(a, b, out=None):
+    """Element-wise subtract, see add_batch for the accepted inputs."""
+    numpy = _numpy()
+    if numpy is not None:
+        return _numpy_elementwise(numpy, numpy.subtract, a, b, out)
+    return _python_elementwise(operator.sub, a, b, out)
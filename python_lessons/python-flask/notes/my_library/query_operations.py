@@ -0,0 +1,656 @@
+
+import abc
+import collections
+import contextlib
+import copy
+import csv
+import itertools
+import operator
+import os
+
+from .compression_operations import compression_from_suffix, open_file
+from .conversion_operations import json_columns_rows, normalize_header, write_records
+from .json_operations import iter_json, loads
+from .table_operations import DEFAULT_SAMPLE_ROWS, cell_converter, infer_types
+
+QUERY_FORMATS = {
+    ".csv": "csv",
+    ".json": "json",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+}
+
+
+class Expr(abc.ABC):
+    """A column expression built from col() and lit() with the usual operators.
+
+    Comparisons, & | ~ and + - * / build new expressions instead of
+    computing anything; a query compiles them into plain functions of the
+    rows of its file. Use & and | (not `and`/`or`) to combine conditions.
+    """
+
+    __hash__ = None  # == builds an expression instead of comparing
+
+    @abc.abstractmethod
+    def compile(self, getter):
+        """Function of one row; getter(name) gives the function reading a column."""
+
+    def __bool__(self):
+        raise TypeError("use & / | / ~ to combine conditions")
+
+    @property
+    def name(self):
+        return repr(self)
+
+    def alias(self, name):
+        return Alias(self, name)
+
+    def __gt__(self, other):
+        return Compare(operator.gt, ">", self, other)
+
+    def __ge__(self, other):
+        return Compare(operator.ge, ">=", self, other)
+
+    def __lt__(self, other):
+        return Compare(operator.lt, "<", self, other)
+
+    def __le__(self, other):
+        return Compare(operator.le, "<=", self, other)
+
+    def __eq__(self, other):
+        return Compare(operator.eq, "==", self, other)
+
+    def __ne__(self, other):
+        return Compare(operator.ne, "!=", self, other)
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __or__(self, other):
+        return Or(self, other)
+
+    def __invert__(self):
+        return Not(self)
+
+    def __add__(self, other):
+        return Arithmetic(operator.add, "+", self, other)
+
+    def __sub__(self, other):
+        return Arithmetic(operator.sub, "-", self, other)
+
+    def __mul__(self, other):
+        return Arithmetic(operator.mul, "*", self, other)
+
+    def __truediv__(self, other):
+        return Arithmetic(operator.truediv, "/", self, other)
+
+    def isin(self, values):
+        return IsIn(self, values)
+
+    def is_null(self):
+        return IsNull(self)
+
+    def sum(self):
+        return Aggregate("sum", self)
+
+    def mean(self):
+        return Aggregate("mean", self)
+
+    def min(self):
+        return Aggregate("min", self)
+
+    def max(self):
+        return Aggregate("max", self)
+
+    def count(self):
+        return Aggregate("count", self)
+
+
+def _expr(value):
+    return value if isinstance(value, Expr) else Literal(value)
+
+
+class Column(Expr):
+    def __init__(self, name):
+        self._name = name
+
+    def compile(self, getter):
+        return getter(self._name)
+
+    @property
+    def name(self):
+        return self._name
+
+    def __repr__(self):
+        return f"col({self._name!r})"
+
+
+class Literal(Expr):
+    def __init__(self, value):
+        self.value = value
+
+    def compile(self, getter):
+        value = self.value
+        return lambda row: value
+
+    def __repr__(self):
+        return repr(self.value)
+
+
+class Alias(Expr):
+    def __init__(self, expr, name):
+        self.expr = expr
+        self._name = name
+
+    def compile(self, getter):
+        return self.expr.compile(getter)
+
+    @property
+    def name(self):
+        return self._name
+
+    def __repr__(self):
+        return f"{self.expr!r}.alias({self._name!r})"
+
+
+class Compare(Expr):
+    """A comparison, false when either side is None (an empty cell) or the types don't compare."""
+
+    def __init__(self, function, symbol, left, right):
+        self.function = function
+        self.symbol = symbol
+        self.left = _expr(left)
+        self.right = _expr(right)
+
+    def compile(self, getter):
+        function = self.function
+        left = self.left.compile(getter)
+        if isinstance(self.right, Literal):
+            value = self.right.value
+            if value is None:
+                return lambda row: False
+
+            def compare_literal(row):
+                cell = left(row)
+                if cell is None:
+                    return False
+                try:
+                    return function(cell, value)
+                except TypeError:
+                    return False
+
+            return compare_literal
+        right = self.right.compile(getter)
+
+        def compare(row):
+            a = left(row)
+            b = right(row)
+            if a is None or b is None:
+                return False
+            try:
+                return function(a, b)
+            except TypeError:
+                return False
+
+        return compare
+
+    def __repr__(self):
+        return f"({self.left!r} {self.symbol} {self.right!r})"
+
+
+class Arithmetic(Expr):
+    """+ - * / of two expressions, None when either side is None."""
+
+    def __init__(self, function, symbol, left, right):
+        self.function = function
+        self.symbol = symbol
+        self.left = _expr(left)
+        self.right = _expr(right)
+
+    def compile(self, getter):
+        function = self.function
+        left = self.left.compile(getter)
+        right = self.right.compile(getter)
+
+        def apply(row):
+            a = left(row)
+            b = right(row)
+            if a is None or b is None:
+                return None
+            return function(a, b)
+
+        return apply
+
+    def __repr__(self):
+        return f"({self.left!r} {self.symbol} {self.right!r})"
+
+
+class And(Expr):
+    def __init__(self, left, right):
+        self.left = _expr(left)
+        self.right = _expr(right)
+
+    def compile(self, getter):
+        left = self.left.compile(getter)
+        right = self.right.compile(getter)
+        return lambda row: left(row) and right(row)
+
+    def __repr__(self):
+        return f"({self.left!r} & {self.right!r})"
+
+
+class Or(Expr):
+    def __init__(self, left, right):
+        self.left = _expr(left)
+        self.right = _expr(right)
+
+    def compile(self, getter):
+        left = self.left.compile(getter)
+        right = self.right.compile(getter)
+        return lambda row: left(row) or right(row)
+
+    def __repr__(self):
+        return f"({self.left!r} | {self.right!r})"
+
+
+class Not(Expr):
+    def __init__(self, expr):
+        self.expr = _expr(expr)
+
+    def compile(self, getter):
+        inner = self.expr.compile(getter)
+        return lambda row: not inner(row)
+
+    def __repr__(self):
+        return f"~{self.expr!r}"
+
+
+class IsIn(Expr):
+    def __init__(self, expr, values):
+        self.expr = _expr(expr)
+        self.values = frozenset(values)
+
+    def compile(self, getter):
+        inner = self.expr.compile(getter)
+        values = self.values
+        return lambda row: inner(row) in values
+
+    def __repr__(self):
+        return f"{self.expr!r}.isin({sorted(self.values, key=repr)!r})"
+
+
+class IsNull(Expr):
+    def __init__(self, expr):
+        self.expr = _expr(expr)
+
+    def compile(self, getter):
+        inner = self.expr.compile(getter)
+        return lambda row: inner(row) is None
+
+    def __repr__(self):
+        return f"{self.expr!r}.is_null()"
+
+
+def col(name):
+    """The column called name, e.g. col("Identifier") > 5000."""
+    return Column(name)
+
+
+def lit(value):
+    """A constant value as an expression."""
+    return Literal(value)
+
+
+class _Sum:
+    __slots__ = ("total",)
+
+    def __init__(self):
+        self.total = 0
+
+    def add(self, value):
+        self.total += value
+
+    def result(self):
+        return self.total
+
+
+class _Count:
+    __slots__ = ("count",)
+
+    def __init__(self):
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+
+    def result(self):
+        return self.count
+
+
+class _Mean:
+    __slots__ = ("total", "count")
+
+    def __init__(self):
+        self.total = 0
+        self.count = 0
+
+    def add(self, value):
+        self.total += value
+        self.count += 1
+
+    def result(self):
+        return self.total / self.count if self.count else None
+
+
+class _Min:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = None
+
+    def add(self, value):
+        if self.value is None or value < self.value:
+            self.value = value
+
+    def result(self):
+        return self.value
+
+
+class _Max(_Min):
+    __slots__ = ()
+
+    def add(self, value):
+        if self.value is None or value > self.value:
+            self.value = value
+
+
+# running state of every aggregate, one instance per group, fed one value at a time
+_ACCUMULATORS = {
+    "sum": _Sum,
+    "count": _Count,
+    "mean": _Mean,
+    "min": _Min,
+    "max": _Max,
+}
+
+
+class Aggregate:
+    """sum, count, mean, min or max of an expression, evaluated incrementally.
+
+    None values (empty cells) are skipped; count() without a column counts rows.
+    """
+
+    def __init__(self, kind, expr=None, name=None):
+        if kind not in _ACCUMULATORS:
+            raise ValueError(f"unknown aggregate {kind!r}, expected one of {', '.join(_ACCUMULATORS)}")
+        self.kind = kind
+        self.expr = None if expr is None else _expr(expr)
+        self._name = name
+
+    @property
+    def name(self):
+        if self._name is not None:
+            return self._name
+        return self.kind if self.expr is None else f"{self.expr.name}_{self.kind}"
+
+    def alias(self, name):
+        return Aggregate(self.kind, self.expr, name)
+
+    def __repr__(self):
+        return f"{self.kind}({'' if self.expr is None else repr(self.expr)})"
+
+
+def count():
+    """Number of rows, per group with group_by."""
+    return Aggregate("count")
+
+
+# what a source gives a query: column names (None when records may differ), a getter(name)
+# returning the function that reads that column from a raw row, and the raw rows
+_Scan = collections.namedtuple("_Scan", "names getter rows")
+
+
+def _query_format(path):
+    name = os.fspath(path)
+    if compression_from_suffix(name) is not None:
+        name = os.path.splitext(name)[0]
+    suffix = os.path.splitext(name)[1].lower()
+    if suffix not in QUERY_FORMATS:
+        raise ValueError(f"don't know how to scan {path}, expected .csv, .json, .jsonl or .ndjson")
+    return QUERY_FORMATS[suffix]
+
+
+@contextlib.contextmanager
+def _scan_csv(path, sample_rows, types, comment, encoding):
+    with open_file(path, "r", encoding=encoding, newline="") as file:
+        width = 0
+        plain = frozenset(" \t" + (comment or "")[:1])
+
+        def keep(row):
+            # comment rows and rows of blank cells are skipped as in csv_rows, short rows padded
+            first = row[0]
+            if first and first[0] not in plain and len(row) >= width:
+                return True
+            first = first.lstrip()
+            if first:
+                if comment and first.startswith(comment):
+                    return False
+            elif not any(map(str.strip, row)):
+                return False
+            if len(row) < width:
+                row.extend([""] * (width - len(row)))
+            return True
+
+        rows = filter(keep, filter(any, csv.reader(file)))
+        names = [normalize_header(name, None) for name in next(rows, ())]
+        width = len(names)
+        sample = list(itertools.islice(rows, sample_rows))
+        column_types = infer_types(names, [[cell.strip() for cell in row] for row in sample])
+        positions = {name: index for index, name in enumerate(names)}
+
+        def position(name):
+            if name not in positions:
+                raise ValueError(f"{path} has no column {name!r}, its columns are {', '.join(names)}")
+            return positions[name]
+
+        for name, column_type in (types or {}).items():
+            column_types[position(name)] = column_type
+
+        def getter(name):
+            # only the cells a query reads are ever trimmed and converted
+            return cell_converter(column_types[position(name)], position(name))
+
+        yield _Scan(names, getter, itertools.chain(sample, rows))
+
+
+@contextlib.contextmanager
+def _scan_json(path, json_path):
+    with open_file(path, "rb") as file:
+        opening = file.read(4096).lstrip()[:1]
+    if opening == b"{" and not json_path:
+        # an object of columns like payroll.json, every column is streamed on its own
+        names, rows = json_columns_rows(path, header_case=None)
+        positions = {name: index for index, name in enumerate(names)}
+
+        def getter(name):
+            if name not in positions:
+                raise ValueError(f"{path} has no column {name!r}, its columns are {', '.join(names)}")
+            return operator.itemgetter(positions[name])
+
+        try:
+            yield _Scan(list(names), getter, rows)
+        finally:
+            rows.close()
+        return
+    rows = iter_json(path, json_path)
+    try:
+        yield _Scan(None, lambda name: operator.methodcaller("get", name), rows)
+    finally:
+        rows.close()
+
+
+@contextlib.contextmanager
+def _scan_json_lines(path, encoding):
+    with open_file(path, "r", encoding=encoding) as file:
+        yield _Scan(None, lambda name: operator.methodcaller("get", name), map(loads, filter(str.strip, file)))
+
+
+class Query:
+    """A lazy query over one file, built by scan() and run by iterating over it.
+
+    Every method returns a new query. Rows stream through the steps: where
+    conditions are checked on the raw rows while the file is read, with only
+    the columns they use converted, and the output dicts are built for the
+    matching rows alone. group_by/agg keep one running aggregate per group,
+    never the rows.
+    """
+
+    def __init__(self, open_source, description):
+        self._open_source = open_source
+        self._description = description
+        self._conditions = []
+        self._selection = None
+        self._keys = None
+        self._aggregates = None
+        self._limit = None
+
+    def _with(self, **changes):
+        query = copy.copy(self)
+        for name, value in changes.items():
+            setattr(query, "_" + name, value)
+        return query
+
+    def where(self, *conditions):
+        """Keep the rows matching every condition, e.g. where(col("salary") > 50000)."""
+        return self._with(conditions=self._conditions + list(conditions))
+
+    def select(self, *columns):
+        """Output only these columns: names, or expressions with alias() to name them."""
+        for column in columns:
+            if isinstance(column, Aggregate):
+                raise ValueError(f"{column!r} is an aggregate, pass it to agg()")
+        if self._aggregates is not None:
+            raise ValueError("select() and agg() do not combine, agg() already says what each output row holds")
+        return self._with(selection=[col(column) if isinstance(column, str) else column for column in columns])
+
+    def group_by(self, *keys):
+        """Group the rows by these columns; agg() then gives one row per group."""
+        return self._with(keys=[col(key) if isinstance(key, str) else key for key in keys])
+
+    def agg(self, *aggregates, **named):
+        """Aggregate every group (or all rows without group_by), named aggregates are aliased."""
+        aggregates = list(aggregates) + [aggregate.alias(name) for name, aggregate in named.items()]
+        for aggregate in aggregates:
+            if not isinstance(aggregate, Aggregate):
+                raise ValueError(f"{aggregate!r} is not an aggregate, use e.g. col('salary').sum() or count()")
+        if self._selection is not None:
+            raise ValueError("select() and agg() do not combine, agg() already says what each output row holds")
+        return self._with(aggregates=aggregates)
+
+    def limit(self, rows):
+        """Stop after this many output rows, the rest of the file is not read."""
+        return self._with(limit=rows)
+
+    def __iter__(self):
+        if self._keys is not None and self._aggregates is None:
+            raise ValueError("group_by needs agg() to say what to compute per group")
+        with self._open_source() as scan:
+            rows = scan.rows
+            for condition in self._conditions:
+                rows = filter(condition.compile(scan.getter), rows)  # filters chain in C, no call between them
+            if self._aggregates is not None:
+                rows = self._aggregate(rows, scan.getter)
+            else:
+                rows = map(self._projection(scan), rows)
+            if self._limit is not None:
+                rows = itertools.islice(rows, self._limit)
+            yield from rows
+
+    def _projection(self, scan):
+        if self._selection is not None:
+            names = [expr.name for expr in self._selection]
+            functions = [expr.compile(scan.getter) for expr in self._selection]
+        elif scan.names is not None:
+            names = scan.names
+            functions = [scan.getter(name) for name in names]
+        else:
+            return dict  # JSON records are already dicts, copied so callers may change them
+        return lambda row: dict(zip(names, [function(row) for function in functions]))
+
+    def _aggregate(self, rows, getter):
+        keys = self._keys or []
+        key_functions = [key.compile(getter) for key in keys]
+        if len(key_functions) == 1:
+            key_of = key_functions[0]  # the value itself is the key, no tuple per row
+        else:
+            def key_of(row):
+                return tuple([function(row) for function in key_functions])
+        factories = [_ACCUMULATORS[aggregate.kind] for aggregate in self._aggregates]
+        value_functions = [(lambda row: True) if aggregate.expr is None else aggregate.expr.compile(getter)
+                           for aggregate in self._aggregates]
+        groups = {}
+        if not keys:
+            groups[()] = [factory() for factory in factories]  # one output row even without input rows
+        for row in rows:
+            key = key_of(row)
+            accumulators = groups.get(key)
+            if accumulators is None:
+                accumulators = groups[key] = [factory() for factory in factories]
+            for accumulator, function in zip(accumulators, value_functions):
+                value = function(row)
+                if value is not None:
+                    accumulator.add(value)
+        names = [key.name for key in keys] + [aggregate.name for aggregate in self._aggregates]
+        for key, accumulators in groups.items():
+            values = [key] if len(key_functions) == 1 else list(key)
+            yield dict(zip(names, values + [accumulator.result() for accumulator in accumulators]))
+
+    def collect(self):
+        """Run the query, return the output rows as a list of dicts."""
+        return list(self)
+
+    def to_csv(self, csv_path, **options):
+        """Run the query into a CSV file through write_records, return the rows written."""
+        return write_records(self, csv_path, **options)
+
+    def __repr__(self):
+        steps = [f"scan({self._description!r})"]
+        if self._conditions:
+            steps.append(f"where({', '.join(map(repr, self._conditions))})")
+        if self._selection is not None:
+            steps.append(f"select({', '.join(map(repr, self._selection))})")
+        if self._keys is not None:
+            steps.append(f"group_by({', '.join(map(repr, self._keys))})")
+        if self._aggregates is not None:
+            steps.append(f"agg({', '.join(map(repr, self._aggregates))})")
+        if self._limit is not None:
+            steps.append(f"limit({self._limit})")
+        return ".".join(steps)
+
+
+def scan(path, format=None, sample_rows=DEFAULT_SAMPLE_ROWS, types=None, json_path=(), comment="#",
+         encoding="utf-8"):
+    """Start a lazy query over a CSV, JSON or JSON Lines file (optionally compressed).
+
+    CSV cells are trimmed and typed like iter_typed_rows: the types are
+    inferred from the first sample_rows rows unless types maps a column to
+    "int", "float", "bool", "date" or "str"; empty cells are None. A JSON
+    file holds an array of objects (at json_path, as in iter_json) or an
+    object of columns like payroll.json. Nothing is read until the query
+    is iterated:
+
+        scan("payroll.csv").where(col("Identifier") > 5000).select("Username").collect()
+    """
+    format = format or _query_format(path)
+    if format == "csv":
+        def open_source():
+            return _scan_csv(path, sample_rows, types, comment, encoding)
+    elif format == "json":
+        def open_source():
+            return _scan_json(path, json_path)
+    elif format == "jsonl":
+        def open_source():
+            return _scan_json_lines(path, encoding)
+    else:
+        raise ValueError(f"unknown query format {format!r}, expected csv, json or jsonl")
+    return Query(open_source, os.fspath(path))
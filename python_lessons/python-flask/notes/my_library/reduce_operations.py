@@ -0,0 +1,188 @@
+
+import array
+import functools
+import itertools
+import operator
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy
+except ImportError:  # numpy is optional, the scans fall back to pure python
+    numpy = None
+
+# below this many values the process pool costs more than it saves
+PARALLEL_THRESHOLD = 1_000_000
+
+_INTEGER_TYPECODES = set("bBhHiIlLqQ")
+
+
+def _integer_bounds(values):
+    """Return the (min, max) a fixed width integer input can hold, or None."""
+    if numpy is not None and isinstance(values, numpy.ndarray):
+        if values.dtype.kind not in "iu":
+            return None
+        info = numpy.iinfo(values.dtype)
+        return int(info.min), int(info.max)
+    if isinstance(values, array.array):
+        code = values.typecode
+    elif isinstance(values, memoryview):
+        code = values.format.lstrip("@=<>!")
+    else:
+        return None
+    if code not in _INTEGER_TYPECODES:
+        return None
+    bits = 8 * values.itemsize
+    if code.islower():
+        return -(1 << (bits - 1)), (1 << (bits - 1)) - 1
+    return 0, (1 << bits) - 1
+
+
+def _check_bounds(results, bounds):
+    low, high = bounds
+    for value in results:
+        if value < low or value > high:
+            raise OverflowError(f"{value} does not fit in the input type range [{low}, {high}]")
+
+
+def _as_exact(values):
+    """Python ints never overflow, so strict mode does its math on them."""
+    if hasattr(values, "tolist"):
+        return values.tolist()
+    return list(values)
+
+
+def _as_sequence(values):
+    """numpy.asarray takes an iterator as one object, so iterators and the like become lists first."""
+    if isinstance(values, (list, tuple, range, array.array, memoryview)):
+        return values
+    if numpy is not None and isinstance(values, numpy.ndarray):
+        return values
+    return list(values)
+
+
+def _like_input(results, values):
+    """Convert exact strict mode results back to the container type of values."""
+    if numpy is not None and isinstance(values, numpy.ndarray):
+        return numpy.array(results, dtype=values.dtype)
+    if numpy is not None:
+        return numpy.array(results)
+    if isinstance(values, array.array):
+        return array.array(values.typecode, results)
+    return results
+
+
+def reduce_add(values, strict=False):
+    """Sum all values, like folding add over them.
+
+    With strict=True a fixed width integer input (numpy integer array,
+    array.array or memoryview) raises OverflowError when the total does not
+    fit in its type instead of silently wrapping around.
+    """
+    values = _as_sequence(values)
+    bounds = _integer_bounds(values) if strict else None
+    if bounds is not None:
+        total = sum(_as_exact(values))
+        _check_bounds((total,), bounds)
+        return total
+    if numpy is None:
+        return sum(values)
+    if isinstance(values, numpy.ndarray):
+        return numpy.add.reduce(values)
+    if not len(values):
+        return 0  # numpy would sum an empty list to 0.0
+    total = numpy.add.reduce(numpy.asarray(values))
+    # the same Python number sum() gives, not a numpy scalar, for input that wasn't numpy
+    return total.item() if isinstance(total, numpy.generic) else total
+
+
+def _scan_dtype(block, subtract):
+    """dtype of the scan of block: numpy.add upcasts small integers, numpy.subtract does not."""
+    ufunc = numpy.subtract if subtract else numpy.add
+    return ufunc.accumulate(block[:1]).dtype
+
+
+def _block_last(block, first, subtract):
+    """Last value of the local scan of block, used to carry into the next block."""
+    if numpy is not None and isinstance(block, numpy.ndarray):
+        dtype = _scan_dtype(block, subtract)
+        if first and subtract:
+            return numpy.subtract.reduce(block, dtype=dtype)
+        return numpy.add.reduce(block, dtype=dtype)
+    if first and subtract:
+        return functools.reduce(operator.sub, block)
+    return sum(block)
+
+
+def _block_scan(block, carry, subtract):
+    """Scan block, continuing from carry (None for the first block)."""
+    if numpy is not None and isinstance(block, numpy.ndarray):
+        ufunc = numpy.subtract if subtract else numpy.add
+        if carry is None:
+            return ufunc.accumulate(block)
+        dtype = _scan_dtype(block, subtract)
+        return ufunc.accumulate(numpy.concatenate((numpy.asarray([carry], dtype=dtype), block.astype(dtype))))[1:]
+    op = operator.sub if subtract else operator.add
+    if carry is None:
+        return list(itertools.accumulate(block, op))
+    return list(itertools.accumulate(block, op, initial=carry))[1:]
+
+
+def _parallel_scan(values, subtract, processes):
+    """Blocked prefix scan: block totals, then carries, then per block scans."""
+    block_size = -(-len(values) // processes)
+    blocks = [values[start:start + block_size] for start in range(0, len(values), block_size)]
+    firsts = [index == 0 for index in range(len(blocks))]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        lasts = list(pool.map(_block_last, blocks[:-1], firsts[:-1], [subtract] * (len(blocks) - 1)))
+        op = operator.sub if subtract else operator.add
+        carries = [None]
+        for last in lasts:
+            carries.append(last if carries[-1] is None else op(carries[-1], last))
+        scanned = list(pool.map(_block_scan, blocks, carries, [subtract] * len(blocks)))
+    if numpy is not None and isinstance(values, numpy.ndarray):
+        return numpy.concatenate(scanned)
+    return list(itertools.chain.from_iterable(scanned))
+
+
+def _scan(values, subtract, strict, processes):
+    values = _as_sequence(values)
+    bounds = _integer_bounds(values) if strict else None
+    source = values
+    if bounds is not None:
+        values = _as_exact(values)
+    elif numpy is not None:
+        values = numpy.asarray(values)
+    elif not isinstance(values, list):
+        values = list(values)
+
+    if processes is None:
+        # numpy scans faster than its blocks pickle to a worker, only Python lists go to the pool by default
+        processes = 1 if numpy is not None and isinstance(values, numpy.ndarray) else os.cpu_count() or 1
+    if processes > 1 and len(values) >= PARALLEL_THRESHOLD:
+        results = _parallel_scan(values, subtract, processes)
+    else:
+        results = _block_scan(values, None, subtract)
+
+    if bounds is not None:
+        _check_bounds(results, bounds)
+        return _like_input(results, source)
+    return results
+
+
+def cumulative_add(values, strict=False, processes=None):
+    """Running totals: [v0, v0 + v1, v0 + v1 + v2, ...].
+
+    Inputs with at least PARALLEL_THRESHOLD values are scanned in blocks on
+    a process pool of processes workers. By default that is all cores for
+    the pure Python path (no numpy, or strict); numpy arrays are scanned in
+    this process unless processes is given, sending their blocks to workers
+    costs more than numpy takes to scan them. strict has the same meaning
+    as in reduce_add, checked for every running total.
+    """
+    return _scan(values, False, strict, processes)
+
+
+def cumulative_subtract(values, strict=False, processes=None):
+    """Running differences: [v0, v0 - v1, v0 - v1 - v2, ...], see cumulative_add."""
+    return _scan(values, True, strict, processes)
@@ -0,0 +1,620 @@
+
+import codecs
+import collections
+import itertools
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .compression_operations import detect_compression
+from .file_operations import DEFAULT_CHUNK_SIZE, line_aligned_ranges, read_chunks
+
+# compiled patterns a PatternRegistry keeps, re's own cache holds 512 and when it is
+# full drops the oldest one, however often that one is used
+DEFAULT_REGISTRY_SIZE = 4096
+# text kept from one chunk to the next by scan_file, matches (and lookarounds) must fit in it
+DEFAULT_SCAN_OVERLAP = 64 * 1024
+# bytes of a file one search_files worker searches at a time
+DEFAULT_SHARD_SIZE = 16 * 1024 * 1024
+
+# a match found by search_files, start and end are byte offsets in the file
+SearchHit = collections.namedtuple("SearchHit", "path start end text groups")
+
+
+class RegistryStats:
+    """Hits, misses and evictions of a PatternRegistry and the time spent compiling."""
+
+    def __init__(self, hits, misses, evictions, compile_seconds, size, pinned):
+        self.hits = hits
+        self.misses = misses
+        self.evictions = evictions
+        self.compile_seconds = compile_seconds
+        self.size = size
+        self.pinned = pinned
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __repr__(self):
+        return (f"RegistryStats(hits={self.hits}, misses={self.misses}, evictions={self.evictions}, "
+                f"hit_rate={self.hit_rate:.3f}, compile_seconds={self.compile_seconds:.3f}, "
+                f"size={self.size}, pinned={self.pinned})")
+
+
+class PatternRegistry:
+    """LRU cache of compiled regular expressions with hit statistics.
+
+    compile(pattern, flags) returns the same compiled pattern as re.compile,
+    compiling it only when it is not among the maxsize most recently used
+    ones; the least recently used pattern is dropped to make room, where re
+    drops the oldest one. search, match, fullmatch, findall, finditer,
+    sub, subn and split take the same arguments as the re functions.
+
+    warm patterns (strings or (pattern, flags) pairs) are compiled right
+    away and pinned, a storm of one off patterns never evicts them. Safe to
+    share between threads, only a miss takes the lock.
+    """
+
+    def __init__(self, maxsize=DEFAULT_REGISTRY_SIZE, warm=()):
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be at least 1, got {maxsize}")
+        self.maxsize = maxsize
+        self._patterns = collections.OrderedDict()
+        self._pinned = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._compile_seconds = 0.0
+        self.warm(warm)
+
+    def _compile(self, key):
+        """Compile outside the lock, other threads keep hitting the cache meanwhile."""
+        started = time.perf_counter()
+        compiled = re.compile(key[1], key[2])
+        return compiled, time.perf_counter() - started
+
+    def warm(self, patterns):
+        """Compile and pin patterns, strings or (pattern, flags) pairs."""
+        for pattern in patterns:
+            pattern, flags = (pattern, 0) if isinstance(pattern, (str, bytes)) else pattern
+            key = (type(pattern), pattern, flags)
+            if key in self._pinned:
+                continue
+            compiled, seconds = self._compile(key)
+            with self._lock:
+                self._compile_seconds += seconds
+                self._patterns.pop(key, None)
+                self._pinned[key] = compiled
+
+    def compile(self, pattern, flags=0):
+        """re.compile(pattern, flags), from the registry when it was compiled before."""
+        if isinstance(pattern, re.Pattern):
+            if flags:
+                raise ValueError("cannot process flags argument with a compiled pattern")
+            return pattern
+        # the type is part of the key like in re, "a" and b"a" are different patterns
+        key = (type(pattern), pattern, flags)
+        # hits skip the lock, single OrderedDict calls are atomic; the hit
+        # counter may then miss a few hits when many threads race on it
+        compiled = self._pinned.get(key)
+        if compiled is None:
+            try:
+                self._patterns.move_to_end(key)
+                compiled = self._patterns[key]
+            except KeyError:  # not cached, or evicted by another thread just now
+                with self._lock:
+                    self._misses += 1
+        if compiled is not None:
+            self._hits += 1
+            return compiled
+        compiled, seconds = self._compile(key)
+        with self._lock:
+            self._compile_seconds += seconds
+            # another thread may have compiled it meanwhile, keep one copy
+            compiled = self._patterns.setdefault(key, compiled)
+            if len(self._patterns) > self.maxsize:
+                self._patterns.popitem(last=False)
+                self._evictions += 1
+        return compiled
+
+    def search(self, pattern, string, flags=0):
+        return self.compile(pattern, flags).search(string)
+
+    def match(self, pattern, string, flags=0):
+        return self.compile(pattern, flags).match(string)
+
+    def fullmatch(self, pattern, string, flags=0):
+        return self.compile(pattern, flags).fullmatch(string)
+
+    def findall(self, pattern, string, flags=0):
+        return self.compile(pattern, flags).findall(string)
+
+    def finditer(self, pattern, string, flags=0):
+        return self.compile(pattern, flags).finditer(string)
+
+    def sub(self, pattern, repl, string, count=0, flags=0):
+        return self.compile(pattern, flags).sub(repl, string, count)
+
+    def subn(self, pattern, repl, string, count=0, flags=0):
+        return self.compile(pattern, flags).subn(repl, string, count)
+
+    def split(self, pattern, string, maxsplit=0, flags=0):
+        return self.compile(pattern, flags).split(string, maxsplit)
+
+    def resize(self, maxsize):
+        """Change maxsize, dropping the least recently used patterns that no longer fit."""
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be at least 1, got {maxsize}")
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._patterns) > maxsize:
+                self._patterns.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self, pinned=False):
+        """Forget the cached patterns (and the pinned ones with pinned=True) and reset the statistics."""
+        with self._lock:
+            self._patterns.clear()
+            if pinned:
+                self._pinned.clear()
+            self._hits = self._misses = self._evictions = 0
+            self._compile_seconds = 0.0
+
+    def stats(self):
+        with self._lock:
+            return RegistryStats(self._hits, self._misses, self._evictions, self._compile_seconds,
+                                 len(self._patterns), len(self._pinned))
+
+    def __len__(self):
+        return len(self._patterns) + len(self._pinned)
+
+    def __repr__(self):
+        return f"PatternRegistry(maxsize={self.maxsize}, size={len(self._patterns)}, pinned={len(self._pinned)})"
+
+
+# the registry behind the module level functions, resize or warm it at startup:
+#   default_registry.resize(20_000); default_registry.warm([r"\d+", (r"hello", re.IGNORECASE)])
+default_registry = PatternRegistry()
+
+compile = default_registry.compile
+search = default_registry.search
+match = default_registry.match
+fullmatch = default_registry.fullmatch
+findall = default_registry.findall
+finditer = default_registry.finditer
+sub = default_registry.sub
+subn = default_registry.subn
+split = default_registry.split
+
+
+class LiteralMatcher:
+    """Find, replace and split on a set of literal strings in one pass (Aho-Corasick).
+
+    LiteralMatcher(["$", "€", "£"]) finds the same matches as
+    re.compile("|".join(map(re.escape, literals))): the leftmost one, and
+    of the literals starting there the first one in the list. Sort the
+    literals longest first to get the longest match instead. The text is
+    scanned once however many literals there are, where re tries the
+    alternatives one after the other at every position: with a thousand
+    literals it is many times faster than re, below about a hundred re's C
+    loop wins. Literals are all str or all bytes.
+    """
+
+    def __init__(self, literals):
+        literals = list(literals)
+        if not literals:
+            raise ValueError("LiteralMatcher needs at least one literal")
+        kind = type(literals[0])
+        if kind not in (str, bytes) or any(type(literal) is not kind for literal in literals):
+            raise ValueError("literals must be all str or all bytes")
+        if not all(literals):
+            raise ValueError("literals must not be empty")
+        self.literals = literals
+        self._kind = kind
+
+        # trie: goto[state] maps the next character to a state, state 0 is the root;
+        # output[state] is (length, index) of the first literal ending there, or None
+        goto = [{}]
+        output = [None]
+        depth = [0]
+        for index, literal in enumerate(literals):
+            state = 0
+            for character in literal:
+                following = goto[state].get(character)
+                if following is None:
+                    following = len(goto)
+                    goto[state][character] = following
+                    goto.append({})
+                    output.append(None)
+                    depth.append(depth[state] + 1)
+                state = following
+            if output[state] is None:  # a repeated literal keeps its first position, like in re
+                output[state] = (len(literal), index)
+
+        # breadth first, so the fail state of a state is always done before it; a state
+        # also takes the output of its fail state when it has none, which is always
+        # shorter and so starts later; delta merges the goto of the fail chain except
+        # the root's, which stays a separate fallback so the tables stay small
+        fail = [0] * len(goto)
+        delta = [{} for _ in goto]
+        queue = collections.deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for character, following in goto[state].items():
+                queue.append(following)
+                fallback = fail[state]
+                while fallback and character not in goto[fallback]:
+                    fallback = fail[fallback]
+                target = goto[fallback].get(character, 0)
+                fail[following] = target if target != following else 0
+                if output[following] is None:
+                    output[following] = output[fail[following]]
+            delta[state] = {**delta[fail[state]], **goto[state]} if fail[state] else dict(goto[state])
+        self._root = goto[0]
+        self._delta = delta
+        self._output = output
+        self._depth = depth
+
+        # jump over text no literal starts in at C speed instead of one character at a time
+        first = sorted(set(literal[:1] for literal in literals))
+        if kind is bytes:
+            self._skip = re.compile(b"[" + b"".join(map(re.escape, first)) + b"]").search
+        else:
+            self._skip = re.compile("[" + "".join(map(re.escape, first)) + "]").search
+
+    def _check(self, text):
+        if not isinstance(text, self._kind):
+            raise TypeError(f"cannot search {type(text).__name__} text with {self._kind.__name__} literals")
+
+    def finditer(self, text):
+        """Yield (start, end, literal) of every match, left to right, without overlaps."""
+        self._check(text)
+        root, delta, output, depth, skip = self._root, self._delta, self._output, self._depth, self._skip
+        end = len(text)
+        position = 0
+        state = 0
+        best = None  # (start, end, index) of the best match so far
+        while True:
+            while position < end:
+                if not state:
+                    found = skip(text, position)
+                    if found is None:
+                        break
+                    position = found.start()
+                character = text[position]
+                state = delta[state].get(character) or root.get(character, 0)
+                position += 1
+                if best is not None and position - depth[state] > best[0]:
+                    # nothing still being matched starts at or before the best match, it is final
+                    yield best[0], best[1], self.literals[best[2]]
+                    position = best[1]
+                    state = 0
+                    best = None
+                    continue
+                ending = output[state]
+                if ending is not None:
+                    start = position - ending[0]
+                    if best is None or start < best[0] or (start == best[0] and ending[1] < best[2]):
+                        best = (start, position, ending[1])
+            if best is None:
+                return
+            # the text ended with a match pending, it is final and the scan goes on after it
+            yield best[0], best[1], self.literals[best[2]]
+            position = best[1]
+            state = 0
+            best = None
+
+    def findall(self, text):
+        """The matched literals, like re.findall."""
+        return [literal for _, _, literal in self.finditer(text)]
+
+    def sub(self, repl, text, count=0):
+        """Replace the matches, like re.sub.
+
+        repl is the replacement for every literal, a mapping from literal to
+        its replacement (literals it lacks stay) or a function called with
+        the literal. Replacements are used as they are, backslashes included.
+        """
+        if callable(repl):
+            replace = repl
+        elif isinstance(repl, (str, bytes)):
+            def replace(literal):
+                return repl
+        else:
+            def replace(literal):
+                return repl.get(literal, literal)
+        pieces = []
+        last = 0
+        for number, (start, end, literal) in enumerate(self.finditer(text), 1):
+            pieces.append(text[last:start])
+            pieces.append(replace(literal))
+            last = end
+            if number == count:
+                break
+        pieces.append(text[last:])
+        return text[:0].join(pieces)
+
+    def split(self, text, maxsplit=0):
+        """Split the text at the matches, like re.split."""
+        pieces = []
+        last = 0
+        for number, (start, end, _) in enumerate(self.finditer(text), 1):
+            pieces.append(text[last:start])
+            last = end
+            if number == maxsplit:
+                break
+        pieces.append(text[last:])
+        return pieces
+
+    def __repr__(self):
+        return f"LiteralMatcher({len(self.literals)} literals, {len(self._delta)} states)"
+
+
+class FileMatch:
+    """A match found by scan_file, start, end and span count from the start of the file."""
+
+    __slots__ = ("match", "offset")
+
+    def __init__(self, match, offset):
+        self.match = match
+        self.offset = offset
+
+    def start(self, group=0):
+        start = self.match.start(group)
+        return start + self.offset if start >= 0 else start
+
+    def end(self, group=0):
+        end = self.match.end(group)
+        return end + self.offset if end >= 0 else end
+
+    def span(self, group=0):
+        return self.start(group), self.end(group)
+
+    def group(self, *groups):
+        return self.match.group(*groups)
+
+    def __getitem__(self, group):
+        return self.match[group]
+
+    def groups(self, default=None):
+        return self.match.groups(default)
+
+    def groupdict(self, default=None):
+        return self.match.groupdict(default)
+
+    def expand(self, template):
+        return self.match.expand(template)
+
+    @property
+    def re(self):
+        return self.match.re
+
+    @property
+    def lastindex(self):
+        return self.match.lastindex
+
+    @property
+    def lastgroup(self):
+        return self.match.lastgroup
+
+    def __repr__(self):
+        return f"<FileMatch object; span={self.span()}, match={self.group()!r}>"
+
+
+def scan_file(pattern, source, flags=0, chunk_size=DEFAULT_CHUNK_SIZE, overlap=DEFAULT_SCAN_OVERLAP,
+              encoding="utf-8", errors="strict"):
+    r"""Yield the matches of pattern in a file like finditer, reading it in chunks.
+
+    A bytes pattern searches the raw bytes and offsets count bytes; a str
+    pattern searches the text decoded with encoding (line endings as they
+    are in the file) and offsets count characters. source is a path or a
+    binary file, .gz, .bz2 and .xz files are decompressed on the fly.
+    Every FileMatch has start(), end() and span() from the start of the
+    file, the rest is the re.Match API.
+
+    The matches are the ones finditer gives on the whole file, none lost or
+    repeated at chunk borders, as long as a match and what its lookarounds
+    look at fit in overlap characters. A match is only taken once at least
+    overlap more text follows it, and the search goes on in the next chunk
+    with overlap text before it, so lookbehinds and \b see it; ^ and \A
+    only match at the start of the file. Memory is about chunk_size.
+    """
+    compiled = compile(pattern, flags)
+    if not 0 < overlap < chunk_size:
+        raise ValueError(f"overlap must be between 0 and chunk_size {chunk_size}, got {overlap}")
+    decode = None
+    if isinstance(compiled.pattern, str):
+        decode = codecs.getincrementaldecoder(encoding)(errors).decode
+    finditer = compiled.finditer
+    carry = compiled.pattern[:0]
+    offset = 0  # position of carry[0] in the file
+    resume = 0  # where the search goes on in carry
+    repeated = None  # an empty match at resume that was already yielded
+    chunks = read_chunks(source, chunk_size)
+    final = False
+    while not final:
+        chunk = next(chunks, None)
+        final = chunk is None
+        if decode is not None:
+            data = decode(b"", True) if final else decode(chunk)
+        else:
+            data = b"" if final else bytes(chunk)
+        buffer = carry + data if carry else data
+        limit = len(buffer) if final else len(buffer) - overlap
+        matches = list(finditer(buffer, resume))
+        if matches and matches[0].start() == matches[0].end() == repeated:
+            del matches[0]
+        # the ends only grow, so the matches that may still change with the text
+        # that follows are the last ones; the first of them is tried again then
+        taken = len(matches)
+        while taken and matches[taken - 1].end() > limit:
+            taken -= 1
+        crossing = matches[taken].start() if taken < len(matches) else None
+        yield from map(FileMatch, matches[:taken], itertools.repeat(offset, taken))
+        last_end = resume
+        if taken:
+            last_end = matches[taken - 1].end()
+            repeated = last_end if matches[taken - 1].start() == last_end else None
+        if final:
+            break
+        resume = crossing if crossing is not None else max(last_end, limit)
+        if repeated is not None and repeated != resume:
+            repeated = None
+        context = max(0, resume - overlap)
+        carry = buffer[context:]
+        offset += context
+        resume -= context
+        if repeated is not None:
+            repeated -= context
+
+
+def _search_block(compiled, path, data, base, before, stop, count_only, encoding):
+    """Matches starting in data[before:stop], a run of whole lines at file offset base + before.
+
+    data[:before] is the newline ending the previous line and data[stop:]
+    the start of the next one; they are only context, so ^, \\A, $, \\b
+    and lookarounds act as they would on the whole file.
+    """
+    end_of_file = stop == len(data)
+    if isinstance(compiled.pattern, bytes):
+        text = data
+    else:
+        text = data.decode(encoding, "surrogateescape")
+        if len(text) != len(data):  # data[stop - 1] is a newline, so the tail decodes on its own
+            stop = len(text) - len(data[stop:].decode(encoding, "surrogateescape"))
+    # an empty match right at the end belongs to the next block, unless there is none
+    stop += end_of_file
+    matches = itertools.takewhile(lambda match: match.start() < stop, compiled.finditer(text, before))
+    if count_only:
+        return sum(1 for _ in matches)
+    if len(text) == len(data):
+        return [SearchHit(path, base + match.start(), base + match.end(), match.group(), match.groups())
+                for match in matches]
+    # characters are not bytes here, count the encoded bytes between the matches
+    hits = []
+    character = 0
+    offset = base
+    for match in matches:
+        offset += len(text[character:match.start()].encode(encoding, "surrogateescape"))
+        end = offset + len(match.group().encode(encoding, "surrogateescape"))
+        hits.append(SearchHit(path, offset, end, match.group(), match.groups()))
+        character = match.end()
+        offset = end
+    return hits
+
+
+def _search_shard(pattern, flags, path, start, end, count_only, encoding):
+    """Search the line aligned byte range start:end of a plain file."""
+    before = 1 if start else 0
+    with open(path, "rb") as file:
+        file.seek(start - before)
+        data = file.read(end - start + before + 1)
+    return _search_block(compile(pattern, flags), path, data, start - before, before, end - start + before,
+                         count_only, encoding)
+
+
+def _stream_blocks(compiled, path, count_only, encoding, shard_size):
+    """Yield the result of every block of whole lines of a compressed file, which can't be split."""
+    data = b""
+    base = 0
+    before = 0
+    for chunk in read_chunks(path, shard_size):
+        data += chunk
+        # the block ends on the last newline that has a byte after it, the byte is context
+        stop = data.rfind(b"\n", before, len(data) - 1) + 1
+        if stop <= before:
+            continue
+        yield _search_block(compiled, path, data, base, before, stop, count_only, encoding)
+        base += stop - 1
+        data = data[stop - 1:]
+        before = 1
+    # the last newline never has a byte after it, so this block is never empty unless the file is
+    yield _search_block(compiled, path, data, base, before, len(data), count_only, encoding)
+
+
+def _count_stream(pattern, flags, path, encoding, shard_size):
+    """Number of matches in a compressed file, counted by one worker."""
+    return sum(_stream_blocks(compile(pattern, flags), path, True, encoding, shard_size))
+
+
+def _path_list(paths):
+    """paths as a list without repeats, a single path becomes a list of one."""
+    if isinstance(paths, (str, bytes, os.PathLike)):
+        return [paths]
+    return list(dict.fromkeys(paths))
+
+
+def _shard_results(pattern, paths, flags, workers, shard_size, count_only, encoding):
+    """Yield (path, result) for every shard of every file in order, searched in a process pool.
+
+    The hits of a compressed file are found in this process a block at a
+    time, so they never pile up in one result; its count is a worker job.
+    """
+    jobs = []
+    for path in paths:
+        if detect_compression(path) is None:
+            jobs.extend((path, _search_shard, (pattern, flags, path, start, end, count_only, encoding))
+                        for start, end in line_aligned_ranges(path, shard_size) or [(0, 0)])
+        elif count_only:
+            jobs.append((path, _count_stream, (pattern, flags, path, encoding, shard_size)))
+        else:
+            jobs.append((path, None, (compile(pattern, flags), path, False, encoding, shard_size)))
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for path, function, arguments in jobs:
+            if function is None:
+                yield from zip(itertools.repeat(path), _stream_blocks(*arguments))
+            else:
+                yield path, function(*arguments)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # results come back in submission order, with a couple of shards per worker in flight
+        pending = collections.deque()
+        for path, function, arguments in jobs:
+            if function is None:
+                while pending:
+                    done_path, future = pending.popleft()
+                    yield done_path, future.result()
+                yield from zip(itertools.repeat(path), _stream_blocks(*arguments))
+                continue
+            pending.append((path, pool.submit(function, *arguments)))
+            if len(pending) >= 2 * workers:
+                done_path, future = pending.popleft()
+                yield done_path, future.result()
+        while pending:
+            done_path, future = pending.popleft()
+            yield done_path, future.result()
+
+
+def search_files(pattern, paths, flags=0, workers=None, shard_size=DEFAULT_SHARD_SIZE, encoding="utf-8"):
+    """Yield the matches of pattern in one or many files as SearchHits, searched in parallel.
+
+    Every file is split into line aligned shards of about shard_size bytes
+    which worker processes search with finditer; the hits come in file and
+    offset order, the same for any number of workers. A hit has the path,
+    start and end byte offsets in the file, the matched text and the groups.
+    A str pattern searches the text decoded with encoding (any ascii
+    compatible one, bytes that don't decode still count one each). A match
+    must not run over the line break that ends a shard, which patterns
+    matching within a line never do. Compressed files are not split, this
+    process decompresses and searches them a block of about shard_size at
+    a time. A path given twice is searched once. workers=1 searches in
+    this process.
+    """
+    paths = _path_list(paths)
+    for _, hits in _shard_results(pattern, paths, flags, workers, shard_size, False, encoding):
+        yield from hits
+
+
+def count_matches(pattern, paths, flags=0, workers=None, shard_size=DEFAULT_SHARD_SIZE, encoding="utf-8"):
+    """{path: number of matches} like search_files, without sending the matches back from the workers."""
+    paths = _path_list(paths)
+    counts = dict.fromkeys(paths, 0)
+    for path, count in _shard_results(pattern, paths, flags, workers, shard_size, True, encoding):
+        counts[path] += count
+    return counts
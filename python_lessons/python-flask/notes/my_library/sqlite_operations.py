@@ -0,0 +1,178 @@
+
+import itertools
+import os
+import sqlite3
+import time
+
+from .conversion_operations import ConversionStats, csv_rows
+from .table_operations import DEFAULT_SAMPLE_ROWS, infer_types
+
+# rows handed to one executemany call
+INGEST_BATCH_ROWS = 50_000
+# rows per transaction, the resume point is saved with every commit
+INGEST_COMMIT_ROWS = 500_000
+# WAL lets readers work during the load and, with synchronous=NORMAL, only syncs at checkpoints;
+# a crash may lose the last transaction but never corrupts the file, and resume redoes it
+INGEST_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -256 * 1024,  # negative means KiB, so 256 MiB
+    "temp_store": "MEMORY",
+}
+PROGRESS_TABLE = "_ingest_progress"
+
+# SQLite column affinity for the types infer_types guesses; numeric text put into an
+# INTEGER or REAL column is stored as a number by SQLite itself, no Python conversion needed
+_AFFINITY = {
+    "int": "INTEGER",
+    "float": "REAL",
+}
+
+
+class IngestStats(ConversionStats):
+    """Rows loaded by this run, how long it took and how many an earlier run had loaded."""
+
+    def __init__(self, rows, seconds, resumed=0):
+        super().__init__(rows, seconds)
+        self.resumed = resumed
+
+    def __repr__(self):
+        return (f"IngestStats(rows={self.rows}, resumed={self.resumed}, seconds={self.seconds:.3f}, "
+                f"rows_per_second={self.rows_per_second:.0f})")
+
+
+def quote_identifier(name):
+    """Quote a table or column name for SQL, "First name" needs it."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def connect(db_path, pragmas=None):
+    """sqlite3 connection with INGEST_PRAGMAS (or pragmas) applied, transactions handled by hand."""
+    connection = sqlite3.connect(db_path, isolation_level=None)
+    for name, value in (INGEST_PRAGMAS if pragmas is None else pragmas).items():
+        connection.execute(f"PRAGMA {name} = {value}")
+    return connection
+
+
+def _source_identity(csv_path):
+    stat = os.stat(csv_path)
+    return os.path.abspath(csv_path), stat.st_size, stat.st_mtime_ns
+
+
+def _progress(connection, table):
+    connection.execute(f"CREATE TABLE IF NOT EXISTS {PROGRESS_TABLE} (tbl TEXT PRIMARY KEY, source TEXT, "
+                       "size INTEGER, mtime_ns INTEGER, rows INTEGER, done INTEGER)")
+    return connection.execute(f"SELECT source, size, mtime_ns, rows, done FROM {PROGRESS_TABLE} WHERE tbl = ?",
+                              (table,)).fetchone()
+
+
+def _create_table(connection, table, header, types, identity):
+    columns = ", ".join(f"{quote_identifier(name)} {_AFFINITY.get(column_type, 'TEXT')}"
+                        for name, column_type in zip(header, types))
+    connection.execute("BEGIN")
+    connection.execute(f"DROP TABLE IF EXISTS {quote_identifier(table)}")
+    connection.execute(f"CREATE TABLE {quote_identifier(table)} ({columns})")
+    connection.execute(f"INSERT OR REPLACE INTO {PROGRESS_TABLE} VALUES (?, ?, ?, ?, 0, 0)", (table, *identity))
+    connection.execute("COMMIT")
+
+
+def _fit(batch, width):
+    """Pad short rows with empty cells."""
+    fitted = []
+    for row in batch:
+        if len(row) > width:
+            raise ValueError(f"row {row!r} has {len(row)} cells, the header only {width}")
+        fitted.append(row + ("",) * (width - len(row)))
+    return fitted
+
+
+def _finish(connection, table, indexes):
+    """Create the indexes in the transaction that marks the load done."""
+    quoted = quote_identifier(table)
+    connection.execute("BEGIN")
+    for index in indexes:
+        columns = (index,) if isinstance(index, str) else tuple(index)
+        name = quote_identifier("_".join(("idx", table) + columns))
+        connection.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {quoted} "
+                           f"({', '.join(map(quote_identifier, columns))})")
+    connection.execute(f"UPDATE {PROGRESS_TABLE} SET done = 1 WHERE tbl = ?", (table,))
+    connection.execute("COMMIT")
+
+
+def ingest_csv(csv_path, db_path, table=None, indexes=(), resume=True, batch_rows=INGEST_BATCH_ROWS,
+               commit_rows=INGEST_COMMIT_ROWS, sample_rows=DEFAULT_SAMPLE_ROWS, pragmas=None, progress=None,
+               progress_every=INGEST_COMMIT_ROWS):
+    """Load a CSV file into a SQLite table, fast and resumable.
+
+    Rows are read with csv_rows (trimmed, comments and blank rows skipped)
+    and inserted with executemany, batch_rows at a time, in transactions of
+    commit_rows rows under the WAL and cache pragmas of INGEST_PRAGMAS.
+    Columns get INTEGER, REAL or TEXT affinity from the types infer_types
+    guesses, so SQLite stores numbers as numbers; empty numeric cells
+    become NULL. indexes, column names or tuples of them, are created once
+    every row is in, which is much cheaper than updating them row by row.
+
+    How many rows are committed is saved in the _ingest_progress table
+    with every commit. With resume=True a load that was interrupted goes on
+    after the last committed row, as long as the CSV file did not change,
+    and a finished load is not done again; resume=False or a changed file
+    starts the table over. table defaults to the file name without suffix.
+    progress(stats) is called about every progress_every rows. Returns an
+    IngestStats.
+    """
+    started = time.perf_counter()
+    table = table or os.path.basename(os.fspath(csv_path)).split(".")[0]
+    identity = _source_identity(csv_path)
+    header, rows = csv_rows(csv_path, header_case=None)
+    if not header:
+        raise ValueError(f"{csv_path} has no header row")
+    sample = list(itertools.islice(rows, sample_rows))
+    types = infer_types(header, sample)
+    rows = itertools.chain(sample, rows)
+
+    connection = connect(db_path, pragmas)
+    try:
+        state = _progress(connection, table)
+        resumed = 0
+        exists = connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                    (table,)).fetchone()
+        if resume and exists and state is not None and tuple(state[:3]) == identity:
+            if state[4]:
+                return IngestStats(0, time.perf_counter() - started, resumed=state[3])
+            resumed = state[3]
+            next(itertools.islice(rows, resumed, resumed), None)  # skip the rows already in the table
+        else:
+            _create_table(connection, table, header, types, identity)
+
+        # SQLite turns the empty numeric cells into NULL itself, no Python work per cell
+        placeholders = ["nullif(?, '')" if column_type in _AFFINITY else "?" for column_type in types]
+        insert = f"INSERT INTO {quote_identifier(table)} VALUES ({', '.join(placeholders)})"
+        width = len(header)
+        loaded = 0
+        reported = 0
+        while True:
+            connection.execute("BEGIN")
+            in_transaction = 0
+            while in_transaction < commit_rows:
+                batch = list(itertools.islice(rows, min(batch_rows, commit_rows - in_transaction)))
+                if not batch:
+                    break
+                if set(map(len, batch)) != {width}:
+                    batch = _fit(batch, width)
+                connection.executemany(insert, batch)
+                in_transaction += len(batch)
+            loaded += in_transaction
+            connection.execute(f"UPDATE {PROGRESS_TABLE} SET rows = ? WHERE tbl = ?", (resumed + loaded, table))
+            connection.execute("COMMIT")
+            if progress is not None and loaded - reported >= progress_every:
+                reported = loaded
+                progress(IngestStats(loaded, time.perf_counter() - started, resumed))
+            if in_transaction < commit_rows:
+                break
+
+        _finish(connection, table, indexes)
+        return IngestStats(loaded, time.perf_counter() - started, resumed)
+    finally:
+        if connection.in_transaction:
+            connection.execute("ROLLBACK")
+        connection.close()
@@ -1,2 +1,71 @@
+
+import os
+from collections import deque
+
+
 def capitalize_word(word):
-    return word.capitalize()
\ No newline at end of file
+    return word.capitalize()
+
+
+def _capitalize_bytes(word):
+    """bytes.capitalize only knows ascii, so other words go through str."""
+    if word.isascii():
+        return word.capitalize()
+    return word.decode("utf-8").capitalize().encode("utf-8")
+
+
+def capitalize_words(iterable_or_file):
+    """Yield every word capitalized like str.capitalize would.
+
+    Accepts any iterable of str, bytes or bytearray words, or an open text or
+    binary file with one word per line. Line endings are stripped and bytes
+    input stays bytes.
+    """
+    is_file = hasattr(iterable_or_file, "read")
+    for word in iterable_or_file:
+        if isinstance(word, str):
+            if is_file:
+                word = word.rstrip("\r\n")
+            yield word.capitalize()
+        else:
+            if is_file:
+                word = word.rstrip(b"\r\n")
+            yield _capitalize_bytes(bytes(word))
+
+
+def _capitalize_range(path, start, end):
+    with open(path, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+    lines = data.split(b"\n")
+    if data.endswith(b"\n"):
+        lines.pop()
+    return b"\n".join(_capitalize_bytes(line.rstrip(b"\r")) for line in lines)
+
+
+def capitalize_words_parallel(path, processes=None, chunk_size=16 * 1024 * 1024):
+    """Process pool version of capitalize_words for large word list files.
+
+    The file is sharded into line aligned byte ranges of about chunk_size
+    bytes, every shard is capitalized in a worker process and the words are
+    yielded as str in file order.
+    """
+    # imported here, the pool and file modules pull in multiprocessing and the
+    # compression libraries, which capitalize_word and capitalize_words never need
+    from concurrent.futures import ProcessPoolExecutor
+
+    from .file_operations import line_aligned_ranges
+
+    ranges = line_aligned_ranges(path, chunk_size)
+    if not ranges:
+        return
+    processes = processes or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        # only keep a couple of shards per worker in flight to bound memory
+        pending = deque()
+        for start, end in ranges:
+            pending.append(pool.submit(_capitalize_range, path, start, end))
+            if len(pending) >= 2 * processes:
+                yield from pending.popleft().result().decode("utf-8").split("\n")
+        while pending:
+            yield from pending.popleft().result().decode("utf-8").split("\n")
@@ -0,0 +1,467 @@
+
+import array
+import datetime
+import itertools
+import json
+import mmap
+import os
+import re
+import sys
+
+try:
+    import numpy
+except ImportError:  # numpy is optional, columns are then array.array and lists
+    numpy = None
+
+from .cache_operations import parse_document
+from .conversion_operations import csv_rows
+from .file_operations import atomic_write
+
+# rows looked at to guess the column types
+DEFAULT_SAMPLE_ROWS = 1000
+# rows converted per column at once
+DEFAULT_BATCH_SIZE = 64 * 1024
+
+_INT = re.compile(r"[+-]?\d+\Z")
+_DATE = re.compile(r"\d{4}-\d{2}-\d{2}\Z")
+_TRUE = frozenset(("true", "yes", "1"))
+_BOOL = frozenset(("true", "false", "yes", "no"))
+
+
+def _cell_type(cell):
+    if cell.lower() in _BOOL:
+        return "bool"
+    if _INT.match(cell):
+        return "int"
+    if _DATE.match(cell):
+        try:
+            datetime.date.fromisoformat(cell)
+            return "date"
+        except ValueError:
+            return "str"
+    try:
+        float(cell)
+        return "float"
+    except ValueError:
+        return "str"
+
+
+def _column_type(cells):
+    """The narrowest type every non empty cell fits, an empty cell turns int into float."""
+    types = {_cell_type(cell) for cell in cells if cell}
+    if not types:
+        return "str"
+    if types == {"int"} and "" in cells:
+        return "float"
+    if len(types) == 1:
+        return types.pop()
+    if types <= {"int", "float"}:
+        return "float"
+    return "str"
+
+
+def infer_types(header, sample):
+    """Guess int, float, bool, date or str for every column of the sample rows."""
+    columns = list(itertools.zip_longest(*sample, fillvalue="")) or [()] * len(header)
+    return [_column_type(column) for column in columns[:len(header)]]
+
+
+def _float(cell):
+    return float(cell) if cell else float("nan")
+
+
+def _check_bools(cells):
+    for cell in cells:
+        if cell.lower() not in _BOOL and cell not in ("0", "1"):
+            raise ValueError(f"{cell!r} is not a bool")
+
+
+def _python_cast(column_type, cells):
+    if column_type == "int":
+        return array.array("q", map(int, cells))
+    if column_type == "float":
+        return array.array("d", map(_float, cells))
+    if column_type == "bool":
+        _check_bools(cells)
+        return [cell.lower() in _TRUE for cell in cells]
+    if column_type == "date":
+        return list(map(datetime.date.fromisoformat, cells))
+    return list(cells)
+
+
+def _numpy_cast(column_type, cells):
+    if column_type == "int":
+        return numpy.array(cells).astype(numpy.int64)
+    if column_type == "float":
+        return numpy.array([cell or "nan" for cell in cells]).astype(numpy.float64)
+    if column_type == "bool":
+        _check_bools(cells)
+        return numpy.isin(numpy.char.lower(numpy.array(cells)), list(_TRUE))
+    if column_type == "date":
+        return numpy.array(cells, dtype="datetime64[D]")
+    return numpy.array(cells, dtype=object)
+
+
+def cast_column(column_type, cells):
+    """Convert a batch of str cells to column_type at once.
+
+    Uses numpy arrays when numpy is installed, array.array or lists
+    otherwise. Raises ValueError when a cell does not fit the type.
+    """
+    try:
+        if numpy is not None:
+            return _numpy_cast(column_type, cells)
+        return _python_cast(column_type, cells)
+    except OverflowError as error:
+        raise ValueError(str(error)) from error
+
+
+def _cast_cell(column_type, cell):
+    """Convert one cell, keeping it as str when it does not fit."""
+    try:
+        values = cast_column(column_type, [cell])
+        return values.tolist()[0] if hasattr(values, "tolist") else values[0]
+    except ValueError:
+        return cell
+
+
+def _parse_bool(cell):
+    lowered = cell.lower()
+    if lowered not in _BOOL and cell not in ("0", "1"):
+        raise ValueError(f"{cell!r} is not a bool")
+    return lowered in _TRUE
+
+
+_CELL_CASTS = {
+    "int": int,
+    "float": float,
+    "bool": _parse_bool,
+    "date": datetime.date.fromisoformat,
+}
+
+
+def cell_converter(column_type, index=None):
+    """Function converting one CSV cell to column_type, for row at a time readers.
+
+    Cells are trimmed. An empty cell of a non str column becomes None and a
+    cell that does not fit the type stays str, as in iter_typed_rows. With
+    index the function takes a whole row and converts row[index], which
+    saves a call per cell.
+    """
+    cast = _CELL_CASTS.get(column_type)
+    if cast is None:
+        return str.strip if index is None else lambda row: row[index].strip()
+
+    def convert(cell):
+        if index is not None:
+            cell = cell[index]
+        try:
+            return cast(cell)  # int and float skip the padding themselves
+        except ValueError:
+            cell = cell.strip()
+            if not cell:
+                return None
+            try:
+                return cast(cell)
+            except ValueError:
+                return cell
+
+    return convert
+
+
+def _batches(rows, batch_size):
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _batch_columns(batch, width):
+    columns = list(itertools.zip_longest(*batch, fillvalue=""))
+    return columns + [("",) * len(batch)] * (width - len(columns))
+
+
+def iter_typed_rows(csv_path, sample_rows=DEFAULT_SAMPLE_ROWS, batch_size=DEFAULT_BATCH_SIZE, types=None):
+    """Yield the rows of a CSV file as tuples of typed values.
+
+    Column types are inferred from the first sample_rows rows unless types
+    is given. Each batch of rows is cast one column at a time; when a cell
+    in a batch does not fit its column type that batch is cast cell by cell
+    and the cells that do not fit stay str.
+    """
+    header, rows = csv_rows(csv_path, header_case=None)
+    sample = list(itertools.islice(rows, sample_rows))
+    types = types or infer_types(header, sample)
+    for batch in _batches(itertools.chain(sample, rows), batch_size):
+        columns = []
+        for column_type, cells in zip(types, _batch_columns(batch, len(header))):
+            try:
+                values = cast_column(column_type, list(cells))
+                columns.append(values.tolist() if hasattr(values, "tolist") else values)
+            except ValueError:
+                columns.append([_cast_cell(column_type, cell) for cell in cells])
+        yield from zip(*columns)
+
+
+def read_typed_columns(csv_path, sample_rows=DEFAULT_SAMPLE_ROWS, batch_size=DEFAULT_BATCH_SIZE):
+    """Read a CSV file into a dict of typed columns.
+
+    Columns are numpy arrays when numpy is installed (array.array for
+    numbers and lists otherwise). A column whose inferred type turns out not
+    to fit a later row is read again as str, so no cell is ever changed.
+    Returns (columns, types).
+    """
+    header, rows = csv_rows(csv_path, header_case=None)
+    sample = list(itertools.islice(rows, sample_rows))
+    types = infer_types(header, sample)
+    parts = [[] for _ in header]
+    conflicts = set()
+    for batch in _batches(itertools.chain(sample, rows), batch_size):
+        for index, cells in enumerate(_batch_columns(batch, len(header))):
+            if index in conflicts:
+                continue
+            try:
+                parts[index].append(cast_column(types[index], list(cells)))
+            except ValueError:
+                conflicts.add(index)
+                parts[index] = []
+    if conflicts:
+        # second pass over the file, only for the columns that fell back to str
+        for index in conflicts:
+            types[index] = "str"
+        _, rows = csv_rows(csv_path, header_case=None)
+        for batch in _batches(rows, batch_size):
+            columns = _batch_columns(batch, len(header))
+            for index in conflicts:
+                parts[index].append(cast_column("str", list(columns[index])))
+    return {name: _join(column_type, column_parts)
+            for name, column_type, column_parts in zip(header, types, parts)}, dict(zip(header, types))
+
+
+def _join(column_type, parts):
+    if numpy is not None:
+        return numpy.concatenate(parts) if parts else cast_column(column_type, [])
+    joined = cast_column(column_type, [])
+    for part in parts:
+        joined.extend(part)
+    return joined
+
+
+COLUMNAR_MAGIC = b"MLCOLS01"
+_ALIGNMENT = 64
+_EPOCH = datetime.date(1970, 1, 1)
+# how every column type is laid out in a compiled table
+_STORAGE = {
+    "int": "q",
+    "float": "d",
+    "bool": "B",
+    "date": "q",  # days since 1970-01-01, numpy reads it as datetime64[D]
+}
+
+
+def _python_values(column_type, values):
+    """Plain python values of a typed column, whatever container it came in."""
+    values = values.tolist() if hasattr(values, "tolist") else list(values)
+    if column_type == "date":
+        return [(value - _EPOCH).days for value in values]
+    return values
+
+
+def _fixed_width_bytes(column_type, values):
+    """Bytes of an int, float, bool or date column, without a python object per value when possible."""
+    typecode = _STORAGE[column_type]
+    if numpy is not None and isinstance(values, numpy.ndarray):
+        if column_type == "date":
+            values = values.astype("datetime64[D]").astype(numpy.int64)
+        dtype = numpy.uint8 if column_type == "bool" else numpy.dtype(typecode)
+        return numpy.ascontiguousarray(values, dtype=dtype).tobytes()
+    if isinstance(values, array.array) and values.typecode == typecode:
+        return values.tobytes()
+    return array.array(typecode, _python_values(column_type, values)).tobytes()
+
+
+def _value_type(values):
+    """Column type of python values, as loaded from JSON or YAML."""
+    kinds = {type(value) for value in values}
+    if kinds == {bool}:
+        return "bool"
+    if kinds == {int}:
+        return "int"
+    if kinds and kinds <= {int, float}:
+        return "float"
+    if kinds == {datetime.date}:
+        return "date"
+    return "str"
+
+
+def _document_columns(path):
+    data = parse_document(path)
+    if isinstance(data, dict) and all(isinstance(value, list) for value in data.values()):
+        columns = data
+    elif isinstance(data, list) and all(isinstance(item, dict) for item in data):
+        names = list(dict.fromkeys(key for item in data for key in item))
+        columns = {name: [item.get(name) for item in data] for name in names}
+    else:
+        raise ValueError(f"{path} holds no table, expected a list of objects or an object of columns")
+    types = {name: _value_type(values) for name, values in columns.items()}
+    return columns, types
+
+
+def compile_table(source_path, target_path):
+    """Compile a CSV, JSON or YAML table into a memory mappable columnar file.
+
+    Numbers, bools and dates become fixed width arrays, str columns an array
+    of uint64 offsets plus one utf-8 blob. Every section starts on a 64 byte
+    boundary after a JSON header. Open the result with ColumnarTable.
+    Returns the number of rows.
+    """
+    if os.path.splitext(source_path)[1].lower() == ".csv":
+        columns, types = read_typed_columns(source_path)
+    else:
+        columns, types = _document_columns(source_path)
+
+    sections = []
+    layout = []
+    rows = None
+    for name, values in columns.items():
+        column_type = types[name]
+        rows = len(values) if rows is None else rows
+        if len(values) != rows:
+            raise ValueError(f"column {name!r} has {len(values)} values, expected {rows}")
+        if column_type in _STORAGE:
+            sections.append(_fixed_width_bytes(column_type, values))
+            layout.append({"name": name, "type": column_type})
+        else:
+            values = _python_values(column_type, values)
+            encoded = [b"" if value is None else str(value).encode("utf-8") for value in values]
+            offsets = array.array("Q", itertools.accumulate(map(len, encoded), initial=0))
+            sections.append(offsets.tobytes())
+            sections.append(b"".join(encoded))
+            layout.append({"name": name, "type": "str"})
+
+    header = {"rows": rows or 0, "byteorder": sys.byteorder, "columns": layout, "sections": []}
+    # section positions are relative to the first aligned byte after the header
+    position = 0
+    for section in sections:
+        header["sections"].append([position, len(section)])
+        position += -(-len(section) // _ALIGNMENT) * _ALIGNMENT
+    encoded_header = json.dumps(header).encode("utf-8")
+    data_start = -(-(len(COLUMNAR_MAGIC) + 8 + len(encoded_header)) // _ALIGNMENT) * _ALIGNMENT
+
+    with atomic_write(target_path, fsync=False) as target:
+        target.write(COLUMNAR_MAGIC)
+        target.write(len(encoded_header).to_bytes(8, "little"))
+        target.write(encoded_header)
+        target.write(bytes(data_start - len(COLUMNAR_MAGIC) - 8 - len(encoded_header)))
+        for section in sections:
+            target.write(section)
+            target.write(bytes(-len(section) % _ALIGNMENT))
+    return rows or 0
+
+
+_NUMPY_TYPES = {
+    "int": "int64",
+    "float": "float64",
+    "bool": "bool",
+}
+
+
+class StringColumn:
+    """A str column of a ColumnarTable, decoded one value at a time on access."""
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[number] for number in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("row out of range")
+        return str(self.data[self.offsets[index]:self.offsets[index + 1]], "utf-8")
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+class ColumnarTable:
+    """Read only view of a file written by compile_table, backed by mmap.
+
+    table["Identifier"] is a numpy array (or a memoryview without numpy) over
+    the mapped file, so no data is parsed or copied when the table is opened.
+    str columns come back as StringColumn. Columns still held after close()
+    keep the map open until they are garbage collected.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = None
+        try:
+            self._load(path)
+        except BaseException:
+            self.close()
+            raise
+
+    def _load(self, path):
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(COLUMNAR_MAGIC)] != COLUMNAR_MAGIC:
+            raise ValueError(f"{path} is not a compiled table")
+        header_size = int.from_bytes(self.map[len(COLUMNAR_MAGIC):len(COLUMNAR_MAGIC) + 8], "little")
+        header_end = len(COLUMNAR_MAGIC) + 8 + header_size
+        self.header = json.loads(self.map[len(COLUMNAR_MAGIC) + 8:header_end])
+        if self.header["byteorder"] != sys.byteorder:
+            raise ValueError(f"{path} was compiled on a {self.header['byteorder']} endian machine")
+        self.data_start = -(-header_end // _ALIGNMENT) * _ALIGNMENT
+        self.rows = self.header["rows"]
+        self.types = {column["name"]: column["type"] for column in self.header["columns"]}
+        self._sections = {}
+        section = 0
+        for column in self.header["columns"]:
+            self._sections[column["name"]] = section
+            section += 1 if column["type"] in _STORAGE else 2
+
+    def __len__(self):
+        return self.rows
+
+    def keys(self):
+        return list(self.types)
+
+    def _view(self, section, typecode):
+        start, length = self.header["sections"][section]
+        start += self.data_start
+        view = memoryview(self.map)[start:start + length]
+        return view.cast(typecode) if typecode != "B" else view
+
+    def __getitem__(self, name):
+        column_type = self.types[name]
+        section = self._sections[name]
+        if column_type not in _STORAGE:
+            return StringColumn(self._view(section, "Q"), self._view(section + 1, "B"))
+        view = self._view(section, _STORAGE[column_type])
+        if numpy is None:
+            return view
+        if column_type == "date":
+            return numpy.frombuffer(view, dtype=numpy.int64).view("datetime64[D]")
+        return numpy.frombuffer(view, dtype=_NUMPY_TYPES[column_type])
+
+    def close(self):
+        if self.map is not None:
+            try:
+                self.map.close()
+            except BufferError:
+                pass  # a caller still holds a column, the map closes when the last view is gone
+            self.map = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
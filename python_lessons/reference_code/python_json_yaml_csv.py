@@ -16,6 +16,10 @@ data_to_write = {'name': 'John', 'age': 30, 'city': 'New York'}
 with open('output.json', 'w') as file:
     json.dump(data_to_write, file, indent=4)  # Write dictionary data to a JSON file with indentation
 
+# my_library.json_operations has dump, dumps, load and loads with the same arguments. They use orjson
+# when it is installed (pip install orjson) and give the same text as json for indent=4 and
+# separators=(',', ':'), only faster; without orjson they simply call the json module.
+
 # 2. Handling YAML Files
 # YAML (YAML Ain't Markup Language) is a human-readable data format. You'll need the PyYAML library to work with YAML files.
 # Install PyYAML with 'pip install pyyaml'.
@@ -43,6 +47,10 @@ with open('data.csv', 'r') as file:
     for row in csv_reader:
         print(row)  # Print each row from the CSV file
 
+# To answer a question about a big CSV or JSON file without loading it all, my_library.query_operations
+# streams it through a query, e.g. the mean salary per position of the people older than 30:
+#   scan('data.csv').where(col('age') > 30).group_by('position').agg(col('salary').mean()).collect()
+
 # Writing CSV
 csv_data_to_write = [
     ['Name', 'Age', 'City'],
@@ -78,6 +86,10 @@ with open('data.csv', 'r') as csv_file:
 with open('output.json', 'w') as json_file:
     json.dump(rows, json_file, indent=4)  # Write the list of dictionaries to a JSON file
 
+# list(csv_reader) keeps every row in memory at once. For very large CSV files write the rows
+# out as they are read instead: my_library.conversion_operations.csv_to_json('data.csv', 'output.json')
+# produces the same output in constant memory (or JSON Lines with json_lines=True).
+
 # JSON to CSV
 with open('data.json', 'r') as json_file:
     data = json.load(json_file)  # Load JSON data
@@ -90,5 +102,9 @@ with open('output.csv', 'w', newline='') as csv_file:
     else:
         raise ValueError("JSON data must be a list of dictionaries to convert to CSV.")
 
+# fieldnames=data[0].keys() fails as soon as a later record has a key the first one lacks. For many
+# records my_library.conversion_operations.write_records(data, 'output.csv') writes the same CSV a
+# few times faster, and without fieldnames it takes the header from the keys of all the first records.
+
 # This lesson covers reading, writing, and converting between JSON, YAML, and CSV files. 
 # The key idea is to read data into Python structures and then write them out to another format as needed.
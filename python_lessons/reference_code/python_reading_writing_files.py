@@ -66,9 +66,31 @@ with open('image.png', 'rb') as file:
 with open('copy_image.png', 'wb') as file:
     file.write(binary_data)  # Write the binary data to a new file
 
+# Reading the whole image first doubles the memory a copy needs. For large files prefer
+# shutil.copyfile or my_library.file_operations.copy_file, which let the kernel copy the data
+# (os.copy_file_range / os.sendfile) and fall back to mmap or chunked readinto.
+
 # 6. Common File Methods
 # file.read(size): Reads the specified number of characters or bytes from the file.
 # file.readline(): Reads a single line from the file.
 # file.readlines(): Reads all the lines and returns them as a list.
 # file.write(string): Writes the string to the file.
 # file.writelines(list_of_strings): Writes multiple lines to the file.
+
+# 7. Reading Very Large Files in Chunks
+# read() and readlines() load the whole file into memory, which does not work for files of many GB.
+# readinto() fills a buffer you already own, so one bytearray can be reused for every chunk and memory stays constant.
+
+buffer = bytearray(1024 * 1024)  # 1 MiB buffer reused for every chunk
+view = memoryview(buffer)  # slicing a memoryview does not copy the data
+with open('example.txt', 'rb') as file:
+    while True:
+        size = file.readinto(buffer)  # Returns how many bytes were read, 0 at the end of the file
+        if not size:
+            break
+        chunk = view[:size]  # Only the first `size` bytes are valid
+        print(len(chunk))
+
+# my_library.file_operations (python-flask/notes/my_library) wraps this pattern:
+# read_chunks(path) yields the chunks and iter_lines(path, encoding='utf-8') yields lines,
+# stitching together lines that are split across two chunks.
@@ -140,6 +140,13 @@ pattern = r"[,;|]"
 result = re.split(pattern, text)
 print(result)  # Outputs: ['apple', 'banana', 'grape', 'orange']
 
+# [,;|] is really just a set of literal strings. With many literals, say a thousand words to
+# replace, an alternation like "word1|word2|..." gets slow because re tries every word at every
+# position. my_library.regex_operations.LiteralMatcher reads the text once however many there are
+# and finds the same matches:
+#   LiteralMatcher(["$", "€", "£"]).sub("USD", "The price is $10, £5, and €7.")
+#   LiteralMatcher(["$", "€", "£"]).sub({"$": "USD", "€": "EUR", "£": "GBP"}, text)
+
 # 11. Advanced Techniques
 
 # a) Compiling Patterns
@@ -148,6 +155,23 @@ print(result)  # Outputs: ['apple', 'banana', 'grape', 'orange']
 pattern = re.compile(r"\\d+")
 matches = pattern.findall("There are 3 apples and 7 bananas")
 
+# re.search(pattern, ...) compiles through a cache of its own, but it only holds 512 patterns
+# and drops the oldest when full, so a program using thousands of different patterns compiles
+# them again and again. my_library.regex_operations has the same search, findall, sub, split...
+# functions backed by a PatternRegistry, an LRU of 4096 compiled patterns that counts hits and
+# misses (default_registry.stats()) and can compile the patterns you know about at startup:
+#   default_registry.warm([r"\d+", (r"hello", re.IGNORECASE)])
+
+# re.findall(pattern, text) needs the whole text in memory, too much for a log of several GB.
+# my_library.regex_operations.scan_file(pattern, 'big.log') reads the file a chunk at a time and
+# yields the same matches as re.finditer, with start() and end() counted from the start of the file
+# (bytes for a bytes pattern like rb"\d+", characters for a str pattern). From the shell:
+#   python -m my_library grep "ERROR.*timeout" big.log
+# re searches on one CPU core. search_files(pattern, ['day1.log', 'day2.log']) splits the files
+# into pieces made of whole lines and searches them in several processes at once, the matches still
+# come in file order; count_matches(...) only counts them. python -m my_library grep uses all cores
+# unless you pass --workers 1, and -c prints the counts.
+
 # b) Flags in Regular Expressions
 # Flags modify regex behavior, such as case sensitivity and multi-line matching.
 
@@ -17,6 +17,12 @@ with open('data.json', 'r') as data_json_file:
     print(data)
     print(type(data))
 
+""" 
+json.load parses the whole file before we get anything back.
+for huge files my_library.json_operations.iter_json('data.json', 'employees')
+gives the employees one by one while the file is still being read
+"""
+
 
 print("------------------------------") 
  
@@ -3,6 +3,9 @@
 2. writing
   atomic: 
     all steps happen in batch mode
+    readers see either the old file or the new one, never half of it:
+    write to a temporary file, then os.replace() it over the real one
+    (my_library.file_operations.atomic_write does exactly that)
 """
 
 file = open('example.txt', 'w')